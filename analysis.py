@@ -0,0 +1,208 @@
+from file_io import open_text
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# upper bound on the number of elements of the pairwise arc comparison of one batch of sentences
+CROSSING_BATCH_ELEMENTS = 1 << 22
+
+# arc length histogram bins: lengths 1 .. ARC_LENGTH_BINS - 1, then everything longer
+ARC_LENGTH_BINS = 11
+
+
+class TreebankArrays:
+    # HEAD and DEPREL columns of a treebank as flat arrays; the tokens of sentence s are
+    # offsets[s] .. offsets[s+1] - 1 and deprel holds ids into deprel_names
+    __slots__ = ('sent_ids', 'offsets', 'idx', 'head', 'deprel', 'deprel_names')
+
+    def __init__(self, sent_ids, offsets, idx, head, deprel, deprel_names):
+        self.sent_ids = sent_ids
+        self.offsets = offsets
+        self.idx = idx
+        self.head = head
+        self.deprel = deprel
+        self.deprel_names = deprel_names
+
+    def __len__(self):
+        return len(self.sent_ids)
+
+
+def load_treebank(path, remove_empty_nodes=True):
+    # same sentences and tokens as data_loader.iter_conllu, without building token objects
+    if np is None:
+        raise ImportError('treebank analysis requires numpy')
+
+    sent_ids = []
+    offsets = [0]
+    idx = []
+    head = []
+    deprel = []
+    deprel_ids = dict()
+    n_tokens = 0
+    sent_id = 'None'
+
+    with open_text(path) as f:
+        for line in f:
+            if line.strip() == '':
+                # empty line in conllu file indicates sentence break
+                if n_tokens > offsets[-1]:
+                    sent_ids.append(sent_id)
+                    offsets.append(n_tokens)
+                sent_id = 'None'
+                continue
+
+            if line.startswith('#'):
+                if line.startswith('# sent_id'):
+                    sent_id = line.strip().split(' ')[-1]
+                continue
+
+            fields = line.strip().split('\t')
+            if remove_empty_nodes and ('.' in fields[0] or '-' in fields[0]):
+                continue
+
+            try:
+                token_idx = int(fields[0])
+                token_head = int(fields[6])
+            except ValueError:
+                continue
+
+            idx.append(token_idx)
+            head.append(token_head)
+            deprel_id = deprel_ids.get(fields[7])
+            if deprel_id is None:
+                deprel_id = deprel_ids[fields[7]] = len(deprel_ids)
+            deprel.append(deprel_id)
+            n_tokens += 1
+
+    # end of file also acts as a sentence break
+    if n_tokens > offsets[-1]:
+        sent_ids.append(sent_id)
+        offsets.append(n_tokens)
+
+    return TreebankArrays(sent_ids, np.array(offsets, dtype=np.int64), np.array(idx, dtype=np.int32),
+                          np.array(head, dtype=np.int32), np.array(deprel, dtype=np.int32), list(deprel_ids))
+
+
+def crossing_counts(treebank):
+    # number of crossing arc pairs per sentence, with the same definition as crossing.is_projective
+    # (root arcs included, shared endpoints do not cross); sentences are compared in batches of
+    # similar length, padded with empty (0, 0) arcs that cross nothing
+    lengths = np.diff(treebank.offsets)
+    start = np.minimum(treebank.idx, treebank.head)
+    end = np.maximum(treebank.idx, treebank.head)
+
+    counts = np.zeros(len(lengths), dtype=np.int64)
+    order = np.argsort(lengths, kind='stable')
+    i = 0
+    while i < len(order):
+        max_length = int(lengths[order[i]])
+        if max_length * max_length > CROSSING_BATCH_ELEMENTS:
+            # very long sentence: compare one arc with all others at a time
+            sentence = order[i]
+            s = start[treebank.offsets[sentence]:treebank.offsets[sentence+1]]
+            e = end[treebank.offsets[sentence]:treebank.offsets[sentence+1]]
+            counts[sentence] = sum(int(np.count_nonzero((s_a < s) & (s < e_a) & (e_a < e))) for s_a, e_a in zip(s, e))
+            i += 1
+            continue
+
+        batch_size = max(1, CROSSING_BATCH_ELEMENTS // (max_length * max_length))
+        # sentences are sorted by length, so the last one of the batch is the longest
+        batch = order[i:i + batch_size]
+        max_length = int(lengths[batch[-1]])
+        batch_size = len(batch)
+
+        columns = np.arange(max_length)
+        mask = columns[None, :] < lengths[batch][:, None]
+        token = treebank.offsets[batch][:, None] + np.minimum(columns[None, :], lengths[batch][:, None] - 1)
+        s = np.where(mask, start[token], 0)
+        e = np.where(mask, end[token], 0)
+
+        # arc a crosses arc b with a starting first: s_a < s_b < e_a < e_b
+        crosses = ((s[:, :, None] < s[:, None, :]) & (s[:, None, :] < e[:, :, None])
+                   & (e[:, :, None] < e[:, None, :]))
+        counts[batch] = crosses.sum(axis=(1, 2))
+
+        i += batch_size
+
+    return counts
+
+
+def tree_depths(treebank):
+    # length of the longest path from the dummy root to a token, per sentence;
+    # -1 for sentences whose heads do not form a tree (cycles)
+    lengths = np.diff(treebank.offsets)
+    sentence = np.repeat(np.arange(len(lengths)), lengths)
+    head = treebank.head.astype(np.int64)
+
+    # tokens are numbered 1 .. n within their sentence after removing empty nodes
+    valid = (head > 0) & (head <= lengths[sentence])
+    parent = np.where(valid, treebank.offsets[sentence] + head - 1, -1)
+
+    depth = np.ones(len(head), dtype=np.int64)
+    active = np.nonzero(parent >= 0)[0]
+    current = parent[active]
+    for _ in range(int(lengths.max(initial=0))):
+        if len(active) == 0:
+            break
+        depth[active] += 1
+        current = parent[current]
+        keep = current >= 0
+        active = active[keep]
+        current = current[keep]
+
+    depths = np.maximum.reduceat(depth, treebank.offsets[:-1]) if len(lengths) else depth[:0]
+    if len(active):
+        depths[np.unique(sentence[active])] = -1
+    return depths
+
+
+def analyze_treebank(path, n_deprels=10):
+    treebank = load_treebank(path)
+    lengths = np.diff(treebank.offsets)
+
+    crossings = crossing_counts(treebank)
+    depths = tree_depths(treebank)
+
+    arc_lengths = np.abs(treebank.idx - treebank.head)[treebank.head > 0]
+    histogram = np.bincount(np.minimum(arc_lengths, ARC_LENGTH_BINS), minlength=ARC_LENGTH_BINS + 1)[1:]
+
+    deprel_counts = np.bincount(treebank.deprel, minlength=len(treebank.deprel_names))
+    top_deprels = np.argsort(-deprel_counts, kind='stable')[:n_deprels]
+
+    tree_depth = depths[depths >= 0]
+    return {'path': path,
+            'sentences': len(treebank),
+            'tokens': int(lengths.sum()),
+            'non_projective_sentences': int(np.count_nonzero(crossings)),
+            'crossing_arc_pairs': int(crossings.sum()),
+            'max_crossing_arc_pairs': int(crossings.max(initial=0)),
+            'cyclic_sentences': int(np.count_nonzero(depths < 0)),
+            'mean_depth': float(tree_depth.mean()) if len(tree_depth) else 0.0,
+            'max_depth': int(tree_depth.max(initial=0)),
+            'mean_arc_length': float(arc_lengths.mean()) if len(arc_lengths) else 0.0,
+            'arc_lengths': {(str(length) if length < ARC_LENGTH_BINS else '>{}'.format(ARC_LENGTH_BINS - 1)):
+                            int(histogram[length - 1]) for length in range(1, ARC_LENGTH_BINS + 1)},
+            'deprels': {treebank.deprel_names[deprel]: int(deprel_counts[deprel]) for deprel in top_deprels}}
+
+
+def analysis_report(analysis):
+    n_sentences = max(analysis['sentences'], 1)
+    n_arcs = max(sum(analysis['arc_lengths'].values()), 1)
+    n_tokens = max(analysis['tokens'], 1)
+
+    lines = [analysis['path'],
+             '  {} sentence(s), {} token(s)'.format(analysis['sentences'], analysis['tokens']),
+             '  non-projective: {} sentence(s) ({:.1f}%), {} crossing arc pair(s), at most {} in one sentence'.format(
+                 analysis['non_projective_sentences'], analysis['non_projective_sentences'] / n_sentences * 100,
+                 analysis['crossing_arc_pairs'], analysis['max_crossing_arc_pairs']),
+             '  depth: mean {:.2f}, max {}{}'.format(
+                 analysis['mean_depth'], analysis['max_depth'],
+                 ', {} cyclic sentence(s)'.format(analysis['cyclic_sentences']) if analysis['cyclic_sentences'] else ''),
+             '  arc length: mean {:.2f}; '.format(analysis['mean_arc_length']) + ', '.join(
+                 '{} {:.1f}%'.format(length, count / n_arcs * 100) for length, count in analysis['arc_lengths'].items()),
+             '  deprels: ' + ', '.join('{} {:.1f}%'.format(deprel, count / n_tokens * 100)
+                                       for deprel, count in analysis['deprels'].items())]
+    return '\n'.join(lines)
@@ -0,0 +1,588 @@
+import os
+import sys
+import json
+import heapq
+import random
+import argparse
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from data_loader import UDToken, UDSentence, iter_conllu, iter_conllu_bulk, read_conllu
+from dtree import DTree
+from btree import BTree, get_obliqueness_hierarchy, sort_children
+from crossing import is_projective
+from projectivizer import lift_non_projective
+from main import (TRange, check_cross_dependencies, sexp_description, to_sexp, pprint_sexp, binarize_sentence,
+                  ud_binarize)
+
+
+UPOS_TAGS = ['ADJ', 'ADP', 'ADV', 'AUX', 'CCONJ', 'DET', 'NOUN', 'NUM', 'PRON', 'PROPN', 'PUNCT', 'VERB']
+
+
+def pprint_sexp_concat(sexp):
+    # previous pprint_sexp, which rebuilds the output string on every line break
+    pretty_sexp = ''
+    opening_brackets = list()
+    break_point = 0
+    offset = 0
+    for i in range(len(sexp)-1):
+        if sexp[i] == '(':
+            opening_brackets.append(i-offset)
+        elif sexp[i] == ')':
+            if sexp[i+1] == ')':
+                opening_brackets.pop()
+            else:
+                last_opening_bracket = opening_brackets.pop()
+                pretty_sexp = pretty_sexp + sexp[break_point:i+1] + '\n' + ' '*last_opening_bracket
+                offset = i-last_opening_bracket+1
+                break_point = i+1
+    pretty_sexp += sexp[break_point:]
+    return pretty_sexp
+
+
+class TRangeDict:
+    # previous TRange, which hashes and compares through its string representation
+    def __init__(self, start_idx, end_idx, type_changed=False):
+        self.start_idx = start_idx
+        self.end_idx = end_idx
+        self.type_changed = type_changed
+
+    def __repr__(self):
+        return ':'.join([str(self.start_idx), str(self.end_idx)])
+
+    def __key(self):
+        return self.__repr__()
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __eq__(self, other):
+        if isinstance(other, TRangeDict):
+            if (self.type_changed and other.type_changed) or (not self.type_changed and not other.type_changed):
+                return self.__key() == other.__key()
+            else:
+                return False
+        return NotImplemented
+
+    def contains_range(self, tr):
+        # both start and end indices are inclusive
+        if self.start_idx <= tr.start_idx and self.end_idx >= tr.end_idx:
+            return True
+        else:
+            return False
+
+
+def count_non_projective(sentences, range_class):
+    # pairwise crossing check over all arcs of each sentence, as in the previous check_cross_dependencies,
+    # followed by look-ups of every arc in a set of arcs to exercise hashing
+    n_non_projective = 0
+    for sentence in sentences:
+        range_list = []
+        has_crossing = False
+        for token in sentence:
+            new_range = range_class(min(token.idx, token.head), max(token.idx, token.head))
+            for r in range_list:
+                if not new_range.contains_range(r) and not r.contains_range(new_range):
+                    if (max(new_range.start_idx, r.start_idx) - min(new_range.end_idx, r.end_idx)) < 0:
+                        has_crossing = True
+                        break
+            if has_crossing:
+                break
+            range_list.append(new_range)
+
+        range_set = set(range_list)
+        for r in range_list:
+            if r not in range_set:
+                raise AssertionError('{} not found in its own set'.format(r))
+
+        n_non_projective += has_crossing
+
+    return n_non_projective
+
+
+def count_non_projective_spans(sentences):
+    # check_cross_dependencies as used by the conversion (crossing.is_projective)
+    return sum(check_cross_dependencies(sentence) for sentence in sentences)
+
+
+def bench_trange(paths, repeat=5):
+    # TRange is no longer on the conversion path; the pairwise loops over both TRange versions are
+    # compared with check_cross_dependencies, which the conversion uses
+    sentences = [ud_sentence.sentence for path in paths for ud_sentence in iter_conllu(path)]
+    print('{} sentences, {} arcs'.format(len(sentences), sum(len(sentence) for sentence in sentences)))
+
+    n_non_projective = count_non_projective_spans(sentences)
+    assert count_non_projective(sentences, TRange) == n_non_projective
+    assert count_non_projective(sentences, TRangeDict) == n_non_projective
+
+    for label, function in (('TRangeDict', lambda: count_non_projective(sentences, TRangeDict)),
+                            ('TRange', lambda: count_non_projective(sentences, TRange)),
+                            ('is_projective', lambda: count_non_projective_spans(sentences))):
+        elapsed = min(timeit.repeat(function, number=1, repeat=repeat))
+        print('{:>16} {:>10.1f} ms'.format(label, elapsed * 1000))
+
+
+def bench_reader(paths, scale=10000):
+    # concatenate the inputs scale times into a temporary file and compare reader throughput
+    with tempfile.NamedTemporaryFile('w', suffix='.conllu', delete=False) as f:
+        scaled_path = f.name
+        for path in paths:
+            with open(path, 'r') as f_in:
+                block = f_in.read().rstrip('\n') + '\n\n'
+            for _ in range(scale):
+                f.write(block)
+
+    try:
+        print('{:>18} {:>12} {:>10} {:>14}'.format('reader', 'tokens', 'seconds', 'tokens/sec'))
+        for reader in (iter_conllu, iter_conllu_bulk):
+            start = time.perf_counter()
+            n_tokens = sum(len(ud_sentence.sentence) for ud_sentence in reader(scaled_path))
+            elapsed = time.perf_counter() - start
+            print('{:>18} {:>12} {:>10.2f} {:>14.0f}'.format(reader.__name__, n_tokens, elapsed, n_tokens / elapsed))
+    finally:
+        os.remove(scaled_path)
+
+
+def chain_sentence(n_tokens, head_final=True, skip_every=0):
+    # head chain of n_tokens tokens, each attached to its right (or left) neighbour;
+    # with skip_every = k, every k-th token skips one level and so does the token before it,
+    # so their arcs cross and the tree is non-projective
+    step = 1 if head_final else -1
+    root = n_tokens if head_final else 1
+
+    heads = [idx + step for idx in range(n_tokens + 1)]
+    heads[root] = 0
+    if skip_every:
+        for idx in range(skip_every, n_tokens + 1, skip_every):
+            if 1 <= idx - step <= n_tokens and 1 <= idx + 2 * step <= n_tokens:
+                heads[idx] = idx + 2 * step
+                heads[idx - step] = idx + step
+
+    sentence = []
+    for idx in range(1, n_tokens + 1):
+        if idx == root:
+            sentence.append(UDToken(idx, 'w{}'.format(idx), 'NOUN', '_', 0, 'root'))
+            continue
+
+        deprel = 'obj' if idx % 2 else 'nmod:poss'
+        sentence.append(UDToken(idx, 'w{}'.format(idx), 'NOUN', '_', heads[idx], deprel))
+
+    return UDSentence(sentence, 'chain-{}'.format(n_tokens), 'None')
+
+
+def recursive_sexp(dtree, head_map, obliqueness_hierarchy):
+    # one-line s-expression of dtree built recursively, as BTree.from_dtree and to_sexp did before
+    # they used explicit stacks; deep trees need run_recursive
+    def _binarize(parent):
+        # (name, idx, left, right, whether left is the head branch, idx of all tokens below)
+        # of the binarized subtree of parent
+        node = (dtree.get_form(parent), parent, None, None, False, {parent})
+        for child in sort_children(dtree, parent, obliqueness_hierarchy):
+            dependent = _binarize(child)
+            left, right = (node, dependent) if node[1] < dependent[1] else (dependent, node)
+            # the branch that contains the head of the child's token is the head branch
+            left_is_head = head_map[child] in left[5]
+
+            # merge the smaller set of token indices into the larger one
+            below, other = (node[5], dependent[5]) if len(node[5]) >= len(dependent[5]) else (dependent[5], node[5])
+            below.update(other)
+            node = (dtree.get_deprel(child), child, left, right, left_is_head, below)
+        return node
+
+    def _sexp(node, is_head=False):
+        name, idx, left, right, left_is_head, _ = node
+        if left is None:
+            return '(' + sexp_description(dtree.get_pos(idx), content=name, is_head=is_head) + ')'
+        return ('(' + sexp_description(name, is_head=is_head) + ' '
+                + _sexp(left, left_is_head) + _sexp(right, not left_is_head) + ')')
+
+    return _sexp(_binarize(dtree.get_children(0)[0]))
+
+
+def run_recursive(function, *args, recursion_limit=1000000, stack_size=1 << 29):
+    # call function in a thread with a large stack and a raised recursion limit
+    result = []
+    old_limit = sys.getrecursionlimit()
+    old_stack_size = threading.stack_size(stack_size)
+    try:
+        sys.setrecursionlimit(recursion_limit)
+        thread = threading.Thread(target=lambda: result.append(function(*args)))
+        thread.start()
+        thread.join()
+    finally:
+        sys.setrecursionlimit(old_limit)
+        threading.stack_size(old_stack_size)
+
+    if not result:
+        raise RuntimeError('{} failed in the recursive reference thread'.format(function.__name__))
+    return result[0]
+
+
+def deep_trees(ud_sentence, use_pseudo_projective=True):
+    # DTree (lifted if needed), BTree and head map of ud_sentence as binarize_sentence builds them
+    head_map = {token.idx: token.head for token in ud_sentence.sentence}
+    dtree = DTree.from_sentence(ud_sentence.sentence)
+    if use_pseudo_projective and check_cross_dependencies(ud_sentence.sentence):
+        lift_non_projective(dtree)
+    return dtree, BTree.from_dtree(dtree), head_map
+
+
+def bench_deep(n_tokens=5000):
+    # stress test on long head chains, which used to exceed the recursion limit;
+    # every output is checked against the recursive reference
+    print('{:>8} {:>11} {:>14} {:>10} {:>14}'.format('tokens', 'head-final', 'non-projective', 'seconds',
+                                                      'output chars'))
+    for head_final in (True, False):
+        for skip_every in (0, 7):
+            ud_sentence = chain_sentence(n_tokens, head_final, skip_every)
+
+            start = time.perf_counter()
+            output = binarize_sentence(ud_sentence, use_pseudo_projective=True)
+            elapsed = time.perf_counter() - start
+
+            dtree, btree, head_map = deep_trees(ud_sentence)
+            expected = run_recursive(recursive_sexp, dtree, head_map, get_obliqueness_hierarchy())
+            assert to_sexp(dtree, btree, head_map) == expected
+            assert output.endswith('\n' + pprint_sexp(expected) + '\n\n')
+
+            print('{:>8} {:>11} {:>14} {:>10.2f} {:>14}'.format(n_tokens, str(head_final), str(skip_every > 0),
+                                                                elapsed, len(output)))
+
+
+def run_cold(command, repeat):
+    # best wall time of running command in a fresh interpreter
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_startup(path='data/samples.conllu', repeat=10):
+    # cold-start cost of a fresh process: bare interpreter, importing main, converting one small file
+    # through the command line and importing networkx, which the conversion path no longer needs
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    work_dir = tempfile.mkdtemp()
+    try:
+        ud_path = os.path.join(work_dir, 'ud', 'treebank')
+        os.makedirs(ud_path)
+        shutil.copy(path, ud_path)
+        export_path = os.path.join(work_dir, 'export')
+
+        python = [sys.executable, '-c']
+        commands = [('interpreter', python + ['pass']),
+                    ('import main', python + ['import sys; sys.path.insert(0, {!r}); import main'.format(package_dir)]),
+                    ('convert ' + os.path.basename(path),
+                     [sys.executable, os.path.join(package_dir, 'main.py'), '--ud-path', os.path.dirname(ud_path),
+                      '--export-path', export_path, '--force']),
+                    ('import networkx', python + ['import networkx'])]
+
+        print('{:>28} {:>10}'.format('command', 'ms'))
+        for label, command in commands:
+            try:
+                elapsed = run_cold(command, repeat)
+            except subprocess.CalledProcessError:
+                print('{:>28} {:>10}'.format(label, 'failed'))
+                continue
+            print('{:>28} {:>10.1f}'.format(label, elapsed * 1000))
+
+        check = 'import sys; sys.path.insert(0, {!r}); import main; print("networkx" in sys.modules)'
+        loaded = subprocess.run(python + [check.format(package_dir)], check=True, capture_output=True, text=True)
+        print('networkx imported by main: {}'.format(loaded.stdout.strip()))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def longest_sexps(paths, top):
+    # s-expressions of the longest sentences in the given CoNLL-U files
+    ud_sentences = (ud_sentence for path in paths for ud_sentence in iter_conllu(path))
+    sentences = heapq.nlargest(top, ud_sentences, key=lambda s: len(s.sentence))
+
+    sexps = []
+    for ud_sentence in sentences:
+        head_map = {token.idx: token.head for token in ud_sentence.sentence}
+        dtree = DTree.from_sentence(ud_sentence.sentence)
+        btree = BTree.from_dtree(dtree)
+        sexps.append((ud_sentence, to_sexp(dtree, btree, head_map)))
+
+    return sexps
+
+
+def bench_pprint(paths, top=10, repeat=5):
+    print('{:>8} {:>10} {:>12} {:>12} {:>8}'.format('tokens', 'chars', 'concat (ms)', 'chunks (ms)', 'speedup'))
+
+    for ud_sentence, sexp in longest_sexps(paths, top):
+        assert pprint_sexp(sexp) == pprint_sexp_concat(sexp)
+
+        n_runs = max(1, 20000 // len(sexp))
+        concat_time = min(timeit.repeat(lambda: pprint_sexp_concat(sexp), number=n_runs, repeat=repeat)) / n_runs
+        chunks_time = min(timeit.repeat(lambda: pprint_sexp(sexp), number=n_runs, repeat=repeat)) / n_runs
+
+        print('{:>8} {:>10} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(len(ud_sentence.sentence), len(sexp),
+                                                                    concat_time * 1000, chunks_time * 1000,
+                                                                    concat_time / chunks_time))
+
+
+def random_projective_heads(n_tokens, rng):
+    # heads (index 0 unused) of a random projective tree: each span picks a head,
+    # and the material on either side of it is cut into sub-spans attached to that head
+    heads = [0] * (n_tokens + 1)
+    root = rng.randint(1, n_tokens)
+    stack = [(1, root - 1, root), (root + 1, n_tokens, root)]
+    while stack:
+        lo, hi, head = stack.pop()
+        while lo <= hi:
+            # cut off a sub-span starting at lo and pick its head
+            end = rng.randint(lo, hi)
+            sub_head = rng.randint(lo, end)
+            heads[sub_head] = head
+            stack.append((lo, sub_head - 1, sub_head))
+            stack.append((sub_head + 1, end, sub_head))
+            lo = end + 1
+    return heads
+
+
+def make_non_projective(heads, rng, n_tries=20):
+    # reattach a random token to a random non-descendant until some arcs cross
+    n_tokens = len(heads) - 1
+    for _ in range(n_tries):
+        dependent = rng.randint(1, n_tokens)
+        if heads[dependent] == 0:
+            continue
+
+        children = [[] for _ in range(n_tokens + 1)]
+        for idx in range(1, n_tokens + 1):
+            children[heads[idx]].append(idx)
+
+        descendants = {dependent}
+        stack = [dependent]
+        while stack:
+            for child in children[stack.pop()]:
+                descendants.add(child)
+                stack.append(child)
+
+        old_head = heads[dependent]
+        heads[dependent] = rng.choice([idx for idx in range(1, n_tokens + 1) if idx not in descendants])
+
+        if not is_projective([(min(idx, heads[idx]), max(idx, heads[idx])) for idx in range(1, n_tokens + 1)]):
+            return True
+        heads[dependent] = old_head
+
+    return False
+
+
+def generate_corpus(path, n_sentences=10000, mean_length=20, max_length=120, non_projective_rate=0.1, seed=1):
+    # synthetic CoNLL-U file; sentence lengths are exponentially distributed around mean_length,
+    # and roughly non_projective_rate of the sentences get crossing arcs
+    rng = random.Random(seed)
+    deprels = sorted(deprel for deprel in get_obliqueness_hierarchy() if deprel != 'root')
+
+    with open(path, 'w') as f:
+        for k in range(n_sentences):
+            n_tokens = min(max_length, 1 + int(rng.expovariate(1 / max(1, mean_length - 1))))
+            heads = random_projective_heads(n_tokens, rng)
+            if n_tokens >= 4 and rng.random() < non_projective_rate:
+                make_non_projective(heads, rng)
+
+            lines = ['# sent_id = synthetic-{}'.format(k), '# text = synthetic sentence {}'.format(k)]
+            for idx in range(1, n_tokens + 1):
+                deprel = 'root' if heads[idx] == 0 else rng.choice(deprels)
+                if deprel != 'root' and rng.random() < 0.1:
+                    deprel += ':sub'
+                form = 'w{}'.format(rng.randint(1, 5000))
+                lines.append('\t'.join([str(idx), form, form, rng.choice(UPOS_TAGS), '_', '_',
+                                        str(heads[idx]), deprel, '_', '_']))
+            f.write('\n'.join(lines) + '\n\n')
+
+
+def run_stage(function, make_inputs, trace_memory=True):
+    # time function over fresh inputs, then run it again under tracemalloc for the peak memory it allocates
+    # (including the outputs it keeps);
+    # returns the outputs and inputs of the timed run, the elapsed seconds and the peak (or None)
+    inputs = make_inputs()
+    start = time.perf_counter()
+    outputs = [function(item) for item in inputs]
+    elapsed = time.perf_counter() - start
+
+    peak_memory = None
+    if trace_memory:
+        traced_inputs = make_inputs()
+        tracemalloc.start()
+        traced_outputs = [function(item) for item in traced_inputs]
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del traced_outputs
+
+    return outputs, inputs, elapsed, peak_memory
+
+
+def stage_report(elapsed, peak_memory, n_sentences, n_tokens):
+    report = {'seconds': elapsed,
+              'sentences': n_sentences,
+              'tokens': n_tokens,
+              'sentences_per_sec': n_sentences / elapsed if elapsed > 0 else None,
+              'tokens_per_sec': n_tokens / elapsed if elapsed > 0 else None}
+    if peak_memory is not None:
+        report['peak_memory_bytes'] = peak_memory
+    return report
+
+
+def bench_pipeline(paths=None, n_sentences=10000, mean_length=20, max_length=120, non_projective_rate=0.1,
+                   seed=1, trace_memory=True):
+    # time every stage of the conversion on the same corpus and return the results as a dict
+    corpus = {'paths': paths}
+    generated_path = None
+    if not paths:
+        with tempfile.NamedTemporaryFile('w', suffix='.conllu', delete=False) as f:
+            generated_path = f.name
+        generate_corpus(generated_path, n_sentences, mean_length, max_length, non_projective_rate, seed)
+        paths = [generated_path]
+        corpus = {'synthetic': {'n_sentences': n_sentences, 'mean_length': mean_length, 'max_length': max_length,
+                                'non_projective_rate': non_projective_rate, 'seed': seed}}
+
+    try:
+        stages = dict()
+
+        outputs, _, elapsed, peak_memory = run_stage(read_conllu, lambda: paths, trace_memory)
+        ud_sentences = [ud_sentence for sentences in outputs for ud_sentence in sentences]
+        sentences = [ud_sentence.sentence for ud_sentence in ud_sentences]
+        n_sentences = len(sentences)
+        n_tokens = sum(len(sentence) for sentence in sentences)
+        stages['read_conllu'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        _, _, elapsed, peak_memory = run_stage(lambda path: sum(1 for _ in iter_conllu_bulk(path)),
+                                               lambda: paths, trace_memory)
+        stages['iter_conllu_bulk'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        dtrees, _, elapsed, peak_memory = run_stage(DTree.from_sentence, lambda: sentences, trace_memory)
+        stages['DTree.from_sentence'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        crossing, _, elapsed, peak_memory = run_stage(check_cross_dependencies, lambda: sentences, trace_memory)
+        stages['check_cross_dependencies'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        # lifting works in place, so every run gets fresh copies of the non-projective trees
+        non_projective = [dtree for dtree, has_crossing in zip(dtrees, crossing) if has_crossing]
+        lift_stats, lifted, elapsed, peak_memory = run_stage(
+            lift_non_projective, lambda: [dtree.copy() for dtree in non_projective], trace_memory)
+        stages['lift_non_projective'] = stage_report(elapsed, peak_memory, len(non_projective),
+                                                     sum(len(dtree.head) - 1 for dtree in non_projective))
+
+        # later stages run on the lifted trees, as ud_binarize with --use-pseudo-projective does
+        lifted = iter(lifted)
+        dtrees = [next(lifted) if has_crossing else dtree for dtree, has_crossing in zip(dtrees, crossing)]
+
+        btrees, _, elapsed, peak_memory = run_stage(BTree.from_dtree, lambda: dtrees, trace_memory)
+        stages['BTree.from_dtree'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        head_maps = [{token.idx: token.head for token in sentence} for sentence in sentences]
+        sexps, _, elapsed, peak_memory = run_stage(lambda item: to_sexp(*item),
+                                                   lambda: list(zip(dtrees, btrees, head_maps)), trace_memory)
+        stages['to_sexp'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        _, _, elapsed, peak_memory = run_stage(pprint_sexp, lambda: sexps, trace_memory)
+        stages['pprint_sexp'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        # end-to-end conversion of the files
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def _convert(path):
+                ud_binarize(path, os.path.join(tmp_dir, 'output.binarized'), use_pseudo_projective=True)
+
+            _, _, elapsed, peak_memory = run_stage(_convert, lambda: paths, trace_memory)
+            stages['ud_binarize'] = stage_report(elapsed, peak_memory, n_sentences, n_tokens)
+
+        corpus.update({'n_sentences': n_sentences,
+                       'n_tokens': n_tokens,
+                       'n_non_projective': len(non_projective),
+                       'n_lifts': sum(stats.n_lifts for stats in lift_stats)})
+
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            max_rss *= 1024
+
+        return {'python': platform.python_version(),
+                'corpus': corpus,
+                'stages': stages,
+                'max_rss_bytes': max_rss}
+    finally:
+        if generated_path is not None:
+            os.remove(generated_path)
+
+
+if __name__ == '__main__':
+    # parse command-line arguments
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='time every conversion stage and report JSON')
+    pipeline_parser.add_argument('paths', nargs='*',
+                                 help='CoNLL-U files to benchmark on (default: a generated synthetic corpus)')
+    pipeline_parser.add_argument('--sentences', action='store', type=int, default=10000, dest='n_sentences',
+                                 help='number of synthetic sentences (default: 10000)')
+    pipeline_parser.add_argument('--mean-length', action='store', type=int, default=20, dest='mean_length',
+                                 help='mean synthetic sentence length (default: 20)')
+    pipeline_parser.add_argument('--max-length', action='store', type=int, default=120, dest='max_length',
+                                 help='maximum synthetic sentence length (default: 120)')
+    pipeline_parser.add_argument('--non-projective-rate', action='store', type=float, default=0.1,
+                                 dest='non_projective_rate',
+                                 help='fraction of synthetic sentences made non-projective (default: 0.1)')
+    pipeline_parser.add_argument('--seed', action='store', type=int, default=1, dest='seed',
+                                 help='random seed of the synthetic corpus (default: 1)')
+    pipeline_parser.add_argument('--no-memory', action='store_false', default=True, dest='trace_memory',
+                                 help='skip the tracemalloc pass that measures peak memory per stage')
+    pipeline_parser.add_argument('--output', action='store', default=None, dest='output',
+                                 help='write the JSON report to this file instead of stdout')
+
+    pprint_parser = subparsers.add_parser('pprint', help='pprint_sexp against the previous implementation')
+    pprint_parser.add_argument('paths', nargs='*', default=['data/samples.conllu'],
+                               help='CoNLL-U files to take the longest sentences from (default: data/samples.conllu)')
+    pprint_parser.add_argument('--top', action='store', type=int, default=10, dest='top',
+                               help='number of longest sentences to benchmark (default: 10)')
+
+    trange_parser = subparsers.add_parser('trange', help='pairwise crossing checks with TRange against is_projective')
+    trange_parser.add_argument('paths', nargs='*', default=['data/samples.conllu'],
+                               help='CoNLL-U files to benchmark on (default: data/samples.conllu)')
+
+    reader_parser = subparsers.add_parser('reader', help='CoNLL-U reader throughput')
+    reader_parser.add_argument('paths', nargs='*', default=['data/samples.conllu'],
+                               help='CoNLL-U files to repeat (default: data/samples.conllu)')
+    reader_parser.add_argument('--scale', action='store', type=int, default=10000, dest='scale',
+                               help='number of times the inputs are repeated (default: 10000)')
+
+    deep_parser = subparsers.add_parser('deep', help='stress test on long head chains')
+    deep_parser.add_argument('--tokens', action='store', type=int, default=5000, dest='n_tokens',
+                             help='length of the head chains (default: 5000)')
+
+    startup_parser = subparsers.add_parser('startup', help='cold-start time of a fresh process')
+    startup_parser.add_argument('path', nargs='?', default='data/samples.conllu',
+                                help='small CoNLL-U file to convert (default: data/samples.conllu)')
+    startup_parser.add_argument('--repeat', action='store', type=int, default=10, dest='repeat',
+                                help='number of runs, the best is reported (default: 10)')
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'pipeline':
+        report = bench_pipeline(args.paths, args.n_sentences, args.mean_length, args.max_length,
+                                args.non_projective_rate, args.seed, args.trace_memory)
+        if args.output is None:
+            print(json.dumps(report, indent=2))
+        else:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    elif args.benchmark == 'pprint':
+        bench_pprint(args.paths, args.top)
+    elif args.benchmark == 'trange':
+        bench_trange(args.paths)
+    elif args.benchmark == 'reader':
+        bench_reader(args.paths, args.scale)
+    elif args.benchmark == 'deep':
+        bench_deep(args.n_tokens)
+    elif args.benchmark == 'startup':
+        bench_startup(args.path, args.repeat)
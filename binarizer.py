@@ -0,0 +1,89 @@
+from data_loader import UDSentence, iter_conllu_lines
+from dtree import DTree
+from btree import BTree, load_obliqueness_hierarchy, get_obliqueness_hierarchy, get_obliqueness_hierarchy_path
+from projectivizer import lift_non_projective
+from manifest import file_hash
+from sentence_cache import SentenceCache
+from main import check_cross_dependencies, write_sexp, sentence_sexp, binarize_sentence, conversion_settings
+
+
+class Binarizer:
+    # in-memory conversion without going through files, e.g. for parser output inside a data loader
+    #
+    # input can be a UDSentence, a string of CoNLL-U data or an iterable of either; the obliqueness
+    # hierarchy is loaded once and the sentence cache (cache_size > 0) is shared by all calls
+    def __init__(self, use_pseudo_projective=False, obliqueness_hierarchy_path=None, cache_size=0, stats=None):
+        if obliqueness_hierarchy_path is None:
+            obliqueness_hierarchy_path = get_obliqueness_hierarchy_path()
+            self.obliqueness_hierarchy = get_obliqueness_hierarchy()
+        else:
+            self.obliqueness_hierarchy = load_obliqueness_hierarchy(obliqueness_hierarchy_path)
+
+        self.use_pseudo_projective = use_pseudo_projective
+        self.stats = stats
+
+        self.cache = None
+        if cache_size > 0:
+            settings = conversion_settings(use_pseudo_projective, file_hash(obliqueness_hierarchy_path))
+            self.cache = SentenceCache(settings, cache_size)
+
+        # reused by every flat s-expression
+        self.buffer = []
+
+    def sentences(self, data):
+        # UDSentence objects of any supported input
+        if isinstance(data, UDSentence):
+            yield data
+        elif isinstance(data, str):
+            yield from iter_conllu_lines(data.split('\n'))
+        else:
+            for item in data:
+                yield from self.sentences(item)
+
+    def sentence(self, data):
+        # the single sentence of data
+        sentences = list(self.sentences(data))
+        if len(sentences) != 1:
+            raise ValueError('expected a single sentence, got {}'.format(len(sentences)))
+        return sentences[0]
+
+    def trees(self, data):
+        # (DTree, BTree) of a single sentence, after lifting if use_pseudo_projective is set
+        ud_sentence = self.sentence(data)
+
+        dtree = DTree.from_sentence(ud_sentence.sentence)
+        if self.use_pseudo_projective and check_cross_dependencies(ud_sentence.sentence):
+            lift_non_projective(dtree)
+
+        return dtree, BTree.from_dtree(dtree, self.obliqueness_hierarchy)
+
+    def sexp(self, data, pretty=True):
+        # s-expression of a single sentence
+        return self._sexp(self.sentence(data), pretty)
+
+    def _sexp(self, ud_sentence, pretty):
+        if pretty:
+            return sentence_sexp(ud_sentence, self.use_pseudo_projective, cache=self.cache, stats=self.stats,
+                                 obliqueness_hierarchy=self.obliqueness_hierarchy)
+
+        head_map = {token.idx: token.head for token in ud_sentence.sentence}
+        dtree, btree = self.trees(ud_sentence)
+
+        self.buffer.clear()
+        write_sexp(dtree, btree, head_map, self.buffer.append)
+        return ''.join(self.buffer)
+
+    def iter_sexps(self, data, pretty=True):
+        # lazily convert every sentence of data, in order
+        for ud_sentence in self.sentences(data):
+            yield self._sexp(ud_sentence, pretty)
+
+    def binarize(self, data, pretty=True):
+        # batch entry point: list with the s-expression of every sentence of data
+        return list(self.iter_sexps(data, pretty))
+
+    def binarize_text(self, data):
+        # the content a .binarized file would have for data
+        return ''.join(binarize_sentence(ud_sentence, self.use_pseudo_projective, cache=self.cache, stats=self.stats,
+                                         obliqueness_hierarchy=self.obliqueness_hierarchy)
+                       for ud_sentence in self.sentences(data))
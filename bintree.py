@@ -0,0 +1,244 @@
+import mmap
+import struct
+from array import array
+
+
+# binary tree file (.bintree) layout, little-endian, every section aligned to 8 bytes:
+#   header     MAGIC, then n_sentences, n_nodes and the byte offsets of the sections below (uint64)
+#   nodes      NODE_FIELDS int32 per node; the nodes of a sentence are stored in pre-order, so its root comes first
+#   index      n_sentences + 1 uint64: number of the first node of every sentence, then n_nodes
+#   vocab      string table of labels (deprels and UPOS) and forms
+#   sent_ids   string table, one entry per sentence
+#   texts      string table, one entry per sentence
+# a string table is its length n (uint64), n + 1 uint64 byte offsets into the blob and the utf-8 blob
+MAGIC = b'UDBTREE1'
+HEADER = struct.Struct('<8s7Q')
+
+# label and form are vocabulary ids (form is -1 for internal nodes); left and right are node numbers
+# within the sentence (-1 for leaves); span_start and span_end are the leaf positions covered by the node
+NODE_FIELDS = ('label', 'form', 'idx', 'left', 'right', 'span_start', 'span_end', 'flags')
+N_NODE_FIELDS = len(NODE_FIELDS)
+FLAG_HEAD = 1   # node is on the side of its parent's head
+
+
+def tree_record(ud_sentence, dtree, btree, head_map):
+    # picklable description of a converted sentence that a BinTreeWriter can store;
+    # labels and forms are plain strings so that records can be built in worker processes
+    order, span_start, span_end, is_head = btree.layout(head_map)
+    name = btree.name
+    idx = btree.idx
+    btree_left = btree.left
+    btree_right = btree.right
+    upos = dtree.upos
+
+    position = [0] * len(order)
+    for pos, node in enumerate(order):
+        position[node] = pos
+
+    labels = []
+    forms = []
+    ints = []
+    for node in order:
+        if btree_left[node] == -1:
+            labels.append(upos[idx[node]])
+            forms.append(name[node])
+            left = right = -1
+        else:
+            labels.append(name[node])
+            forms.append(None)
+            left = position[btree_left[node]]
+            right = position[btree_right[node]]
+
+        ints += (idx[node], left, right, span_start[node], span_end[node], FLAG_HEAD if is_head[node] else 0)
+    ints = array('i', ints)
+
+    return ud_sentence.sent_id, ud_sentence.text, labels, forms, ints
+
+
+def _pad(f):
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def _write_string_table(f, strings):
+    blobs = [string.encode('utf-8') for string in strings]
+    offsets = array('Q', [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    start = f.tell()
+    f.write(struct.pack('<Q', len(blobs)))
+    f.write(offsets.tobytes())
+    f.write(b''.join(blobs))
+    _pad(f)
+    return start
+
+
+class BinTreeWriter:
+    # streams nodes to the file as sentences are added; the index, vocabulary and string tables
+    # are written by close
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+        self.f.write(b'\0' * HEADER.size)
+        self.vocab = dict()
+        self.sent_ids = []
+        self.texts = []
+        self.index = array('Q')
+        self.n_nodes = 0
+
+    def _intern(self, string):
+        string_id = self.vocab.get(string)
+        if string_id is None:
+            string_id = self.vocab[string] = len(self.vocab)
+        return string_id
+
+    def add(self, record):
+        sent_id, text, labels, forms, ints = record
+        self.index.append(self.n_nodes)
+        self.sent_ids.append(sent_id)
+        self.texts.append(text)
+
+        intern = self._intern
+        nodes = array('i', [0]) * (N_NODE_FIELDS * len(labels))
+        nodes[0::N_NODE_FIELDS] = array('i', [intern(label) for label in labels])
+        nodes[1::N_NODE_FIELDS] = array('i', [intern(form) if form is not None else -1 for form in forms])
+        for field in range(6):
+            nodes[field+2::N_NODE_FIELDS] = ints[field::6]
+        self.f.write(nodes.tobytes())
+        self.n_nodes += len(labels)
+
+    def close(self):
+        if self.f is None:
+            return
+        f = self.f
+        self.f = None
+
+        _pad(f)
+        index_offset = f.tell()
+        self.index.append(self.n_nodes)
+        f.write(self.index.tobytes())
+
+        vocab_offset = _write_string_table(f, self.vocab)
+        sent_ids_offset = _write_string_table(f, self.sent_ids)
+        texts_offset = _write_string_table(f, self.texts)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(self.sent_ids), self.n_nodes, HEADER.size, index_offset,
+                            vocab_offset, sent_ids_offset, texts_offset))
+        f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StringTable:
+    # strings of a memory-mapped string table, decoded on access
+    __slots__ = ('buffer', 'offsets', 'blob_start')
+
+    def __init__(self, buffer, start):
+        n = struct.unpack_from('<Q', buffer, start)[0]
+        self.buffer = buffer
+        self.offsets = buffer[start+8:start+8+(n+1)*8].cast('Q')
+        self.blob_start = start + 8 + (n+1)*8
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start = self.blob_start + self.offsets[i]
+        end = self.blob_start + self.offsets[i+1]
+        return str(self.buffer[start:end], 'utf-8')
+
+
+class BinTree:
+    # a sentence read from a .bintree file; node 0 is the root
+    __slots__ = ('sent_id', 'text', 'label', 'form', 'idx', 'left', 'right', 'span_start', 'span_end', 'is_head')
+
+    def __init__(self, sent_id, text, label, form, idx, left, right, span_start, span_end, is_head):
+        self.sent_id = sent_id
+        self.text = text
+        self.label = label        # deprel for internal nodes ('*' marks lifted arcs), UPOS for leaves
+        self.form = form          # None for internal nodes
+        self.idx = idx            # index of the token in the sentence
+        self.left = left
+        self.right = right
+        self.span_start = span_start
+        self.span_end = span_end
+        self.is_head = is_head
+
+    def __len__(self):
+        return len(self.label)
+
+
+class BinTreeReader:
+    # random access to the sentences of a .bintree file through mmap; nothing is parsed on open
+    # except the header, so reader[k] costs the same for every k
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        self.mmap = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self.mmap)
+
+        (magic, self.n_sentences, self.n_nodes, nodes_offset, index_offset,
+         vocab_offset, sent_ids_offset, texts_offset) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('not a .bintree file: {}'.format(path))
+
+        self.buffer = buffer
+        self.nodes = buffer[nodes_offset:nodes_offset + self.n_nodes*N_NODE_FIELDS*4].cast('i')
+        self.index = buffer[index_offset:index_offset + (self.n_sentences+1)*8].cast('Q')
+        self.vocab = StringTable(buffer, vocab_offset)
+        self.sent_ids = StringTable(buffer, sent_ids_offset)
+        self.texts = StringTable(buffer, texts_offset)
+        self.sentence_numbers = None
+
+    def __len__(self):
+        return self.n_sentences
+
+    def node_array(self, k):
+        # zero-copy int32 view of the nodes of sentence k, NODE_FIELDS per node
+        return self.nodes[self.index[k]*N_NODE_FIELDS:self.index[k+1]*N_NODE_FIELDS]
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.n_sentences
+        if not 0 <= k < self.n_sentences:
+            raise IndexError('sentence {} out of range'.format(k))
+
+        nodes = self.node_array(k).tolist()
+        columns = [nodes[field::N_NODE_FIELDS] for field in range(N_NODE_FIELDS)]
+        label, form, idx, left, right, span_start, span_end, flags = columns
+
+        vocab = self.vocab
+        return BinTree(self.sent_ids[k], self.texts[k],
+                       [vocab[label_id] for label_id in label],
+                       [vocab[form_id] if form_id != -1 else None for form_id in form],
+                       idx, left, right, span_start, span_end,
+                       [bool(flag & FLAG_HEAD) for flag in flags])
+
+    def find(self, sent_id):
+        # number of the first sentence with this sent_id; the lookup table is built on first use
+        if self.sentence_numbers is None:
+            self.sentence_numbers = dict()
+            for k in range(self.n_sentences):
+                self.sentence_numbers.setdefault(self.sent_ids[k], k)
+        return self.sentence_numbers[sent_id]
+
+    def close(self):
+        if self.mmap is None:
+            return
+        self.nodes.release()
+        self.index.release()
+        for table in (self.vocab, self.sent_ids, self.texts):
+            table.offsets.release()
+        self.buffer.release()
+        self.mmap.close()
+        self.f.close()
+        self.mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,125 +1,272 @@
+import os
+import sys
 import json
-import networkx as nx
-import networkx.algorithms.dag as nx_dag
 
 
-obliqueness_hierarchy_path = 'ud2-obliqueness-hierarchy.json'
-obliqueness_hierarchy = {}
-with open(obliqueness_hierarchy_path, 'r') as f:
-    json_data = json.load(f)
-    for obj in json_data:
-        obliqueness_hierarchy[obj['name']] = obj['priority']
+DEFAULT_OBLIQUENESS_HIERARCHY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  'ud2-obliqueness-hierarchy.json')
+
+# score of deprels marked with '*' by pseudo-projective lifting
+LIFTED_PRIORITY = 100
+
+
+class ObliquenessHierarchy(dict):
+    # deprel -> priority table; full labels (e.g., nmod:poss, obj*) are resolved
+    # on first use and stored, so every later lookup is a single dict access
+    def __missing__(self, deprel):
+        # deprel with '*' indicates it has been moved from its original position;
+        # in this case we move it to the top of the hierarchy (EXPERIMENTAL)
+        if '*' in deprel:
+            priority = LIFTED_PRIORITY
+        else:
+            # obliqueness hierarchy doesn't include sub-dependency types (e.g., nmod:poss)
+            base_deprel = deprel.split(':')[0]
+            if base_deprel == deprel:
+                raise KeyError(deprel)
+            priority = self[base_deprel]
+
+        self[sys.intern(deprel)] = priority
+        return priority
+
+
+def load_obliqueness_hierarchy(path):
+    obliqueness_hierarchy = ObliquenessHierarchy()
+    with open(path, 'r') as f:
+        json_data = json.load(f)
+        for obj in json_data:
+            obliqueness_hierarchy[sys.intern(obj['name'])] = obj['priority']
+    return obliqueness_hierarchy
+
+
+obliqueness_hierarchy_path = DEFAULT_OBLIQUENESS_HIERARCHY_PATH
+obliqueness_hierarchy = None
+
+
+def set_obliqueness_hierarchy_path(path):
+    # the file is only read when the hierarchy is first needed
+    global obliqueness_hierarchy_path, obliqueness_hierarchy
+    obliqueness_hierarchy_path = path
+    obliqueness_hierarchy = None
+
+
+def get_obliqueness_hierarchy_path():
+    return obliqueness_hierarchy_path
+
+
+def get_obliqueness_hierarchy():
+    global obliqueness_hierarchy
+    if obliqueness_hierarchy is None:
+        obliqueness_hierarchy = load_obliqueness_hierarchy(obliqueness_hierarchy_path)
+    return obliqueness_hierarchy
+
+
+# follow https://www.aclweb.org/anthology/D17-1009.pdf
+def sort_children(dtree, parent, obliqueness_hierarchy):
+    # order in which the children of parent are attached in the binary tree
+    # get immediate children
+    children = dtree.get_children(parent)
+
+    # add children to their stacks according to their position relative to parent
+    left_stack = []
+    for child in children:
+        if child < parent:
+            left_stack.append(child)
+
+    right_stack = []
+    for child in reversed(children):
+        if child > parent:
+            right_stack.append(child)
+
+    # get obliqueness hierarchy scores of children
+    obliqueness_hierarchy_scores = {}
+    for child in children:
+        obliqueness_hierarchy_scores[child] = obliqueness_hierarchy[dtree.get_deprel(child)]
+
+    # sort children by scores (naive sort)
+    # sorted_children = sorted(obliqueness_hierarchy_scores,
+    #                          key=obliqueness_hierarchy_scores.get,
+    #                          reverse=False)
+
+    # sort children on top of the stacks by scores
+    sorted_children = []
+    while len(left_stack) > 0 or len(right_stack) > 0:
+        if len(left_stack) == 0 and len(right_stack) > 0:
+            sorted_children.append(right_stack[-1])
+            right_stack.pop()
+            continue
+        elif len(left_stack) > 0 and len(right_stack) == 0:
+            sorted_children.append(left_stack[-1])
+            left_stack.pop()
+            continue
+
+        top_left = left_stack[-1]
+        top_right = right_stack[-1]
+
+        top_left_score = obliqueness_hierarchy_scores[top_left]
+        top_right_score = obliqueness_hierarchy_scores[top_right]
+
+        if top_left_score <= top_right_score:
+            sorted_children.append(top_left)
+            left_stack.pop()
+        else:
+            sorted_children.append(top_right)
+            right_stack.pop()
+
+    return sorted_children
 
 
 class BTree:
-    def __init__(self, btree=None):
-        self.btree = btree
+    # array-backed binary tree with integer node ids; leaves have left = right = head_child = -1
+    __slots__ = ('name', 'deprel', 'idx', 'left', 'right', 'head_child', 'root')
 
-    @staticmethod
-    def from_dtree(dtree):
-        # initialize binary tree
-        btree = nx.DiGraph()
+    def __init__(self):
+        self.name = []         # token form for leaves, deprel for internal nodes
+        self.deprel = []       # None for leaves
+        self.idx = []          # index of the dtree token this node stands for
+        self.left = []
+        self.right = []
+        self.head_child = []   # child on the side of the dependency head
+        self.root = -1
 
-        # follow https://www.aclweb.org/anthology/D17-1009.pdf
-        def _binarize(btree, dtree, parent):
-            # get immediate children
-            children = dtree.get_children(parent)
-
-            # add children to their stacks according to their position relative to parent
-            left_stack = []
-            for child in children:
-                if child < parent:
-                    left_stack.append(child)
-
-            right_stack = []
-            for child in reversed(children):
-                if child > parent:
-                    right_stack.append(child)
-
-            # get obliqueness hierarchy scores of children
-            obliqueness_hierarchy_scores = {}
-            for child in children:
-                # deprel with '*' indicates it has been moved from its original position;
-                # in this case we move it to the top of the hierarchy (EXPERIMENTAL)
-                deprel = dtree.get_deprel(child)
-                if '*' in deprel:
-                    obliqueness_hierarchy_scores[child] = 100
-                else:
-                    # obliqueness hierarchy doesn't include sub-dependency types (e.g., nmod:poss)
-                    deprel_parts = deprel.split(':')
-                    deprel = deprel_parts[0]
-                    obliqueness_hierarchy_scores[child] = obliqueness_hierarchy[deprel]
-
-            # sort children by scores (naive sort)
-            # sorted_children = sorted(obliqueness_hierarchy_scores,
-            #                          key=obliqueness_hierarchy_scores.get,
-            #                          reverse=False)
-
-            # sort children on top of the stacks by scores
-            sorted_children = []
-            while len(left_stack) > 0 or len(right_stack) > 0:
-                if len(left_stack) == 0 and len(right_stack) > 0:
-                    sorted_children.append(right_stack[-1])
-                    right_stack.pop()
-                    continue
-                elif len(left_stack) > 0 and len(right_stack) == 0:
-                    sorted_children.append(left_stack[-1])
-                    left_stack.pop()
-                    continue
-
-                top_left = left_stack[-1]
-                top_right = right_stack[-1]
-
-                top_left_score = obliqueness_hierarchy_scores[top_left]
-                top_right_score = obliqueness_hierarchy_scores[top_right]
-
-                if top_left_score <= top_right_score:
-                    sorted_children.append(top_left)
-                    left_stack.pop()
-                else:
-                    sorted_children.append(top_right)
-                    right_stack.pop()
-
-            # recursively binarize tree
-            dtree_parent = dtree.dtree.nodes[parent]
-            btree_parent = (dtree_parent['form'] + '*' + str(parent))
-            btree.add_node(btree_parent,
-                           name=dtree_parent['form'],
-                           deprel=None,
-                           idx=parent)
-
-            for child in sorted_children:
-                this_deprel = dtree.get_deprel(child)
-                temp_root = (this_deprel + ':' + str(child))
-                btree.add_node(temp_root,
-                               name=this_deprel,
-                               deprel=this_deprel,
-                               idx=child)
+    def add_node(self, name, deprel, idx, head_child=-1, dependent_child=-1):
+        node = len(self.name)
+        self.name.append(name)
+        self.deprel.append(deprel)
+        self.idx.append(idx)
+        self.head_child.append(head_child)
 
-                btree.add_edge(temp_root, btree_parent)
-                btree.add_edge(temp_root, _binarize(btree, dtree, child))
+        # order children by the index of the tokens they stand for
+        if head_child == -1 or self.idx[head_child] < self.idx[dependent_child]:
+            self.left.append(head_child)
+            self.right.append(dependent_child)
+        else:
+            self.left.append(dependent_child)
+            self.right.append(head_child)
 
-                btree_parent = temp_root
+        return node
 
-            return btree_parent
+    @staticmethod
+    def from_dtree(dtree, obliqueness_hierarchy=None):
+        if obliqueness_hierarchy is None:
+            obliqueness_hierarchy = get_obliqueness_hierarchy()
+
+        # initialize binary tree
+        btree = BTree()
+
+        # explicit stack instead of recursion, so that deep trees do not hit the recursion limit;
+        # a frame is [dtree node, its sorted children, number of children attached, current btree node]
+        # and a finished frame hands its btree node to the frame below
+        def _new_frame(parent):
+            sorted_children = sort_children(dtree, parent, obliqueness_hierarchy)
+            return [parent, sorted_children, 0, btree.add_node(dtree.get_form(parent), None, parent)]
 
         # root = 0
         # root only has one child
-        _binarize(btree, dtree, dtree.get_children(0)[0])
+        stack = [_new_frame(dtree.get_children(0)[0])]
+        finished = None
+        while True:
+            frame = stack[-1]
+            parent, sorted_children, n_attached, btree_parent = frame
+
+            if finished is not None:
+                # attach the binarized subtree of the last child
+                child = sorted_children[n_attached]
+                this_deprel = dtree.get_deprel(child)
+                btree_parent = btree.add_node(this_deprel, this_deprel, child, btree_parent, finished)
+                n_attached += 1
+                frame[2] = n_attached
+                frame[3] = btree_parent
+                finished = None
+
+            if n_attached < len(sorted_children):
+                stack.append(_new_frame(sorted_children[n_attached]))
+            else:
+                stack.pop()
+                if not stack:
+                    break
+                finished = btree_parent
+
+        btree.root = btree_parent
 
-        return BTree(btree)
+        return btree
 
     def tree(self):
-        return self.btree
+        # read-only networkx view of this tree, keyed by 'form*idx' for leaves and 'deprel:idx' for internal nodes;
+        # networkx is only needed here and imported on first use
+        import networkx as nx
+
+        btree = nx.DiGraph()
+
+        keys = []
+        for node in range(len(self.name)):
+            if self.deprel[node] is None:
+                key = self.name[node] + '*' + str(self.idx[node])
+            else:
+                key = self.deprel[node] + ':' + str(self.idx[node])
+            keys.append(key)
+            btree.add_node(key, name=self.name[node], deprel=self.deprel[node], idx=self.idx[node])
+
+        for node in range(len(self.name)):
+            if self.left[node] != -1:
+                btree.add_edge(keys[node], keys[self.left[node]])
+                btree.add_edge(keys[node], keys[self.right[node]])
+
+        return nx.freeze(btree)
+
+    def layout(self, head_map):
+        # pre-order node list (leaves come out left to right), span of leaf positions covered by every
+        # node and whether a node is on the side of its parent's head in the original tree (head_map)
+        left = self.left
+        right = self.right
+        idx = self.idx
+
+        order = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if left[node] != -1:
+                stack.append(right[node])
+                stack.append(left[node])
+
+        span_start = [0] * len(self.name)
+        span_end = [0] * len(self.name)
+        leaf_pos = dict()
+        for node in order:
+            if left[node] == -1:
+                span_start[node] = span_end[node] = len(leaf_pos)
+                leaf_pos[idx[node]] = len(leaf_pos)
+
+        for node in reversed(order):
+            if left[node] != -1:
+                span_start[node] = span_start[left[node]]
+                span_end[node] = span_end[right[node]]
+
+        # the branch that contains the head of a node's token is the head branch
+        is_head = [False] * len(self.name)
+        for node in order:
+            if left[node] != -1:
+                head_pos = leaf_pos.get(head_map[idx[node]])
+                if head_pos is not None and span_start[left[node]] <= head_pos <= span_end[left[node]]:
+                    is_head[left[node]] = True
+                else:
+                    is_head[right[node]] = True
+
+        return order, span_start, span_end, is_head
 
     def get_root(self):
-        return [n for n, d in self.btree.in_degree() if d == 0][0]
+        return self.root
 
-    def get_children(self, idx):
-        children = sorted(list(self.btree.successors(idx)))
-        if idx in children:
-            children.remove(idx)
-        return children
+    def get_children(self, node):
+        if self.left[node] == -1:
+            return []
+        return [self.left[node], self.right[node]]
 
-    def get_all_descendants(self, idx):
-        return nx_dag.descendants(self.btree, idx)
+    def get_all_descendants(self, node):
+        descendants = set()
+        stack = self.get_children(node)
+        while stack:
+            node = stack.pop()
+            descendants.add(node)
+            stack.extend(self.get_children(node))
+        return descendants
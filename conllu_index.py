@@ -0,0 +1,112 @@
+import os
+from file_io import open_binary
+
+
+# the index of x.conllu is stored as x.conllu.idx: a header line with the size and modification time of
+# the indexed file, then one 'offset<TAB>length<TAB>sent_id' line per sentence block; offsets and lengths
+# are in bytes of the uncompressed data
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+
+
+def index_path(conllu_path):
+    return conllu_path + INDEX_SUFFIX
+
+
+def file_signature(conllu_path):
+    stat = os.stat(conllu_path)
+    return '{}\t{}'.format(stat.st_size, stat.st_mtime_ns)
+
+
+def build_index(conllu_path):
+    # (offset, length, sent_id) of every block that has token lines, in file order;
+    # blocks are split on empty lines as in data_loader.iter_conllu
+    entries = []
+    offset = 0
+    start = None
+    end = 0
+    sent_id = 'None'
+    has_tokens = False
+
+    with open_binary(conllu_path) as f:
+        for line in f:
+            if line.strip() == b'':
+                if start is not None and has_tokens:
+                    entries.append((start, end - start, sent_id))
+                start = None
+                sent_id = 'None'
+                has_tokens = False
+            else:
+                if start is None:
+                    start = offset
+                end = offset + len(line)
+
+                if line.startswith(b'#'):
+                    if line.startswith(b'# sent_id'):
+                        sent_id = line.strip().split(b' ')[-1].decode('utf-8')
+                else:
+                    has_tokens = True
+
+            offset += len(line)
+
+    # end of file also acts as a sentence break
+    if start is not None and has_tokens:
+        entries.append((start, end - start, sent_id))
+
+    return entries
+
+
+def save_index(conllu_path, entries):
+    with open(index_path(conllu_path), 'w', encoding='utf-8') as f:
+        f.write('# conllu-index\t{}\t{}\n'.format(INDEX_VERSION, file_signature(conllu_path)))
+        for offset, length, sent_id in entries:
+            f.write('{}\t{}\t{}\n'.format(offset, length, sent_id))
+
+
+def load_index(conllu_path):
+    # the stored index, or None if there is none or the file changed since it was built
+    path = index_path(conllu_path)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r', encoding='utf-8') as f:
+        header = f.readline().rstrip('\n')
+        if header != '# conllu-index\t{}\t{}'.format(INDEX_VERSION, file_signature(conllu_path)):
+            return None
+
+        entries = []
+        for line in f:
+            offset, length, sent_id = line.rstrip('\n').split('\t', 2)
+            entries.append((int(offset), int(length), sent_id))
+
+    return entries
+
+
+def get_index(conllu_path):
+    # load the index of conllu_path, building and storing it first if needed;
+    # if the directory is not writable the index is only kept in memory
+    entries = load_index(conllu_path)
+    if entries is None:
+        entries = build_index(conllu_path)
+        try:
+            save_index(conllu_path, entries)
+        except OSError:
+            pass
+    return entries
+
+
+def parse_shard(spec):
+    # 'i/N' -> (i, N), shards numbered from 0
+    shard, n_shards = (int(part) for part in spec.split('/'))
+    if n_shards < 1 or not 0 <= shard < n_shards:
+        raise ValueError('invalid shard {}: expected i/N with 0 <= i < N'.format(spec))
+    return shard, n_shards
+
+
+def select_shard(entries, shard, n_shards):
+    # contiguous run of about len(entries) / n_shards blocks, so that a shard is read with few seeks
+    return entries[shard * len(entries) // n_shards:(shard+1) * len(entries) // n_shards]
+
+
+def select_sent_ids(entries, sent_ids):
+    return [entry for entry in entries if entry[2] in sent_ids]
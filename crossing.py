@@ -0,0 +1,134 @@
+def arc_spans(sentence):
+    # (start, end) span of every token's arc to its head
+    return [(min(token.idx, token.head), max(token.idx, token.head)) for token in sentence]
+
+
+def is_projective(spans):
+    # two arcs cross if exactly one endpoint of one lies strictly inside the other;
+    # sorted by start (and longest first), non-crossing spans nest like brackets
+    open_ends = []
+    for start, end in sorted(spans, key=lambda span: (span[0], -span[1])):
+        # close spans that end at or before this one starts (shared endpoints do not cross)
+        while open_ends and open_ends[-1] <= start:
+            open_ends.pop()
+
+        if open_ends and open_ends[-1] < end:
+            return False
+
+        open_ends.append(end)
+
+    return True
+
+
+class CrossingIndex:
+    # dynamic set of arcs over token positions 0 .. size - 1, answering whether (and which) arcs
+    # cross a given span in O(log n) (plus O(log n) per reported arc)
+    #
+    # arc (s, e) crosses (a, b) iff a < s < b < e or s < a < e < b, so we keep two segment trees:
+    # the largest end among arcs starting at each position and the smallest start among arcs
+    # ending at each position
+    __slots__ = ('size', 'ends_by_start', 'starts_by_end', 'max_end', 'min_start')
+
+    def __init__(self, size, spans=()):
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+
+        self.ends_by_start = [[] for _ in range(self.size)]
+        self.starts_by_end = [[] for _ in range(self.size)]
+        self.max_end = [-1] * (2 * self.size)
+        self.min_start = [self.size] * (2 * self.size)
+
+        for start, end in spans:
+            self.add(start, end)
+
+    def _update(self, start, end):
+        # recompute the leaves of start and end from their lists, then their ancestors
+        ends = self.ends_by_start[start]
+        node = start + self.size
+        self.max_end[node] = max(ends) if ends else -1
+        node //= 2
+        while node:
+            self.max_end[node] = max(self.max_end[2 * node], self.max_end[2 * node + 1])
+            node //= 2
+
+        starts = self.starts_by_end[end]
+        node = end + self.size
+        self.min_start[node] = min(starts) if starts else self.size
+        node //= 2
+        while node:
+            self.min_start[node] = min(self.min_start[2 * node], self.min_start[2 * node + 1])
+            node //= 2
+
+    def add(self, start, end):
+        # a new arc can only raise max_end and lower min_start, so only ancestors whose value
+        # changes are visited; this keeps adding k arcs at one position O(k log n)
+        self.ends_by_start[start].append(end)
+        self.starts_by_end[end].append(start)
+
+        max_end = self.max_end
+        node = start + self.size
+        while node and max_end[node] < end:
+            max_end[node] = end
+            node //= 2
+
+        min_start = self.min_start
+        node = end + self.size
+        while node and min_start[node] > start:
+            min_start[node] = start
+            node //= 2
+
+    def remove(self, start, end):
+        # raises ValueError if the arc is not in the index; the leaves are recomputed from the remaining arcs
+        self.ends_by_start[start].remove(end)
+        self.starts_by_end[end].remove(start)
+        self._update(start, end)
+
+    def _nodes(self, lo, hi):
+        # segment tree nodes covering positions lo .. hi - 1
+        nodes = []
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                nodes.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                nodes.append(hi)
+            lo //= 2
+            hi //= 2
+        return nodes
+
+    def crosses(self, start, end):
+        # whether any arc in the index crosses (start, end)
+        for node in self._nodes(start + 1, end):
+            if self.max_end[node] > end or self.min_start[node] < start:
+                return True
+        return False
+
+    def crossing(self, start, end):
+        # all arcs in the index that cross (start, end)
+        arcs = []
+
+        # arcs starting strictly inside the span and ending after it
+        stack = [node for node in self._nodes(start + 1, end) if self.max_end[node] > end]
+        while stack:
+            node = stack.pop()
+            if node >= self.size:
+                position = node - self.size
+                arcs.extend((position, e) for e in self.ends_by_start[position] if e > end)
+            else:
+                stack.extend(child for child in (2 * node, 2 * node + 1) if self.max_end[child] > end)
+
+        # arcs ending strictly inside the span and starting before it
+        stack = [node for node in self._nodes(start + 1, end) if self.min_start[node] < start]
+        while stack:
+            node = stack.pop()
+            if node >= self.size:
+                position = node - self.size
+                arcs.extend((s, position) for s in self.starts_by_end[position] if s < start)
+            else:
+                stack.extend(child for child in (2 * node, 2 * node + 1) if self.min_start[child] < start)
+
+        return sorted(arcs)
@@ -1,7 +1,9 @@
-import copy
+from file_io import open_text, open_binary
 
 
 class UDToken:
+    __slots__ = ('idx', 'form', 'upos', 'feats', 'head', 'deprel')
+
     def __init__(self, idx, form, upos, feats, head, deprel):
         self.idx = idx   # index of this token
         self.form = form
@@ -12,72 +14,176 @@ class UDToken:
 
 
 class UDSentence:
+    __slots__ = ('sentence', 'sent_id', 'text')
+
     def __init__(self, sentence, sent_id, text):
         self.sentence = sentence
         self.sent_id = sent_id
         self.text = text
 
 
-def read_conllu(path, remove_empty_nodes=True):
-    sentences = []
+def iter_conllu_lines(lines, remove_empty_nodes=True):
+    # lazily yield one UDSentence per sentence block of an iterable of CoNLL-U lines
+    sentence = []
+    sent_id = 'None'
+    text = 'None'
+
+    for line in lines:
+        # empty line in conllu file indicates sentence break
+        if line.strip() == '':
+            if len(sentence) > 0:
+                yield UDSentence(sentence, sent_id, text)
+
+            sentence = []
+            sent_id = 'None'
+            text = 'None'
+            continue
+
+        # extract sent_id and text
+        # skip other comments in conllu file
+        if line.startswith('#'):
+            if line.startswith('# sent_id'):
+                parts = line.strip().split(' ')
+                sent_id = parts[-1]
+                continue
+            elif line.startswith('# text ='):
+                text = line[9:].strip()
+                continue
+            else:
+                continue
+
+        # split field by tab
+        fields = line.strip().split('\t')
+
+        if remove_empty_nodes:
+            if '.' in fields[0] or '-' in fields[0]:
+                continue
+
+        # 0 = word index (starting at 1)
+        # 1 = word form
+        # 3 = UPOS
+        # 5 = features
+        # 6 = head of current word index
+        # 7 = UD relation
+        try:
+            current_token = UDToken(int(fields[0]),
+                                    fields[1],
+                                    fields[3],
+                                    fields[5],
+                                    int(fields[6]),
+                                    fields[7])
+        except ValueError:
+            pass
+        else:
+            sentence.append(current_token)
+
+    # end of file also acts as a sentence break
+    if len(sentence) > 0:
+        yield UDSentence(sentence, sent_id, text)
+
+
+def iter_conllu(path, remove_empty_nodes=True):
+    # lazily yield one UDSentence per sentence block, reading the file line by line;
+    # .gz, .xz and .zst files are decompressed on the fly
+    with open_text(path) as f:
+        yield from iter_conllu_lines(f, remove_empty_nodes)
+
 
-    with open(path, 'r') as f:
-        # add empty line at the end to imitate conllu sentence break
-        lines = f.readlines()
-        lines.append('')
+def iter_conllu_blocks(path, entries, remove_empty_nodes=True):
+    # sentences of the blocks at the given (offset, length, ...) entries of a conllu_index,
+    # seeking to each block instead of reading the whole file
+    with open_binary(path) as f:
+        for entry in entries:
+            f.seek(entry[0])
+            block = f.read(entry[1]).decode('utf-8')
+            yield from iter_conllu_lines(block.split('\n'), remove_empty_nodes)
 
+
+# str -> int for common token indices, cheaper than calling int() for every ID and HEAD field
+SMALL_INTS = {str(i): i for i in range(4096)}
+
+
+def iter_conllu_bulk(path, remove_empty_nodes=True, buffer_size=1 << 24):
+    # same sentences as iter_conllu, but the file is read in large buffers and
+    # token lines are only split up to the DEPREL column
+    with open_text(path) as f:
         sentence = []
         sent_id = 'None'
         text = 'None'
+        tail = ''
 
-        for line in lines:
-            # empty line in conllu file indicates sentence break
-            if line.strip() == '':
-                if len(sentence) > 0:
-                    new_sentence = UDSentence(copy.deepcopy(sentence), sent_id, text)
-                    sentences.append(new_sentence)
+        while True:
+            buffer = f.read(buffer_size)
+            if buffer:
+                lines = (tail + buffer).split('\n')
+                # the last line may continue in the next buffer
+                tail = lines.pop()
+            else:
+                # end of file also acts as a sentence break
+                lines = [tail, '']
+                tail = None
 
-                sentence = []
-                sent_id = 'None'
-                text = 'None'
-                continue
+            for line in lines:
+                if line and line[0].isdigit():
+                    # 0 = word index, 1 = word form, 3 = UPOS, 5 = features,
+                    # 6 = head of current word index, 7 = UD relation, 8 = rest of the line
+                    fields = line.split('\t', 8)
+                    if len(fields) < 9:
+                        fields = line.strip().split('\t')
 
-            # extract sent_id and text
-            # skip other comments in conllu file
-            if line.startswith('#'):
-                if line.startswith('# sent_id'):
-                    parts = line.strip().split(' ')
-                    sent_id = parts[-1]
-                    continue
-                elif line.startswith('# text ='):
-                    text = line[9:].strip()
+                    token_id = fields[0]
+                    if remove_empty_nodes and ('.' in token_id or '-' in token_id):
+                        continue
+
+                    idx = SMALL_INTS.get(token_id)
+                    head = SMALL_INTS.get(fields[6])
+                    try:
+                        if idx is None:
+                            idx = int(token_id)
+                        if head is None:
+                            head = int(fields[6])
+                    except ValueError:
+                        continue
+
+                    sentence.append(UDToken(idx, fields[1], fields[3], fields[5], head, fields[7]))
                     continue
-                else:
+
+                if line.startswith('#'):
+                    if line.startswith('# sent_id'):
+                        sent_id = line.strip().split(' ')[-1]
+                    elif line.startswith('# text ='):
+                        text = line[9:].strip()
                     continue
 
-            # split field by tab
-            fields = line.strip().split('\t')
+                # empty line in conllu file indicates sentence break
+                if line.strip() == '':
+                    if len(sentence) > 0:
+                        yield UDSentence(sentence, sent_id, text)
 
-            if remove_empty_nodes:
-                if '.' in fields[0] or '-' in fields[0]:
+                    sentence = []
+                    sent_id = 'None'
+                    text = 'None'
                     continue
 
-            # 0 = word index (starting at 1)
-            # 1 = word form
-            # 3 = UPOS
-            # 5 = features
-            # 6 = head of current word index
-            # 7 = UD relation
-            try:
-                current_token = UDToken(int(fields[0]),
-                                        fields[1],
-                                        fields[3],
-                                        fields[5],
-                                        int(fields[6]),
-                                        fields[7])
-            except ValueError:
-                pass
-            else:
-                sentence.append(current_token)
+                # any other line is parsed as a token line
+                fields = line.strip().split('\t')
+                if remove_empty_nodes and ('.' in fields[0] or '-' in fields[0]):
+                    continue
+
+                try:
+                    sentence.append(UDToken(int(fields[0]), fields[1], fields[3], fields[5],
+                                            int(fields[6]), fields[7]))
+                except ValueError:
+                    pass
+
+            if tail is None:
+                break
+
+
+def read_conllu(path, remove_empty_nodes=True):
+    return list(iter_conllu(path, remove_empty_nodes))
+
 
-    return sentences
+def parse_conllu(text, remove_empty_nodes=True):
+    # sentences of CoNLL-U data held in a string
+    return list(iter_conllu_lines(text.split('\n'), remove_empty_nodes))
@@ -1,66 +1,103 @@
-import networkx as nx
-import networkx.algorithms.dag as nx_dag
+from bisect import insort
 
 
 class DTree:
-    def __init__(self, dtree=None):
-        self.dtree = dtree
+    # parallel arrays indexed by token idx; index 0 is the dummy root
+    __slots__ = ('head', 'deprel', 'form', 'upos', 'children')
+
+    def __init__(self, head, deprel, form, upos, children=None):
+        self.head = head
+        self.deprel = deprel
+        self.form = form
+        self.upos = upos
+
+        # sorted list of children for each idx
+        if children is None:
+            children = [[] for _ in range(len(head))]
+            for idx in range(1, len(head)):
+                if head[idx] is not None:
+                    children[head[idx]].append(idx)
+        self.children = children
 
     @staticmethod
     def from_sentence(sentence):
-        # initialize dependency tree
-        dtree = nx.DiGraph()
+        size = 1
+        for token in sentence:
+            size = max(size, token.idx + 1, token.head + 1)
 
         # create a dummy root node
-        dtree.add_node(0, form='ROOT', upos='ROOT')
+        head = [None] * size
+        deprel = [None] * size
+        form = [None] * size
+        upos = [None] * size
+        form[0] = 'ROOT'
+        upos[0] = 'ROOT'
 
-        # add nodes to dtree
         for token in sentence:
-            dtree.add_node(token.idx, form=token.form, upos=token.upos, deprel=token.deprel)
+            head[token.idx] = token.head
+            deprel[token.idx] = token.deprel
+            form[token.idx] = token.form
+            upos[token.idx] = token.upos
 
-        # add edges to dtree
-        for token in sentence:
-            dtree.add_edge(token.head, token.idx, deprel=token.deprel)
-
-        return DTree(dtree)
+        return DTree(head, deprel, form, upos)
 
     def tree(self):
-        return self.dtree
+        # read-only networkx view of this tree, built on each call; rewire arcs with set_head instead,
+        # so add_edge/remove_edge on the view raise NetworkXError;
+        # networkx is only needed here and imported on first use, so conversion works without it
+        import networkx as nx
+
+        dtree = nx.DiGraph()
+
+        dtree.add_node(0, form='ROOT', upos='ROOT')
+        for idx in range(1, len(self.head)):
+            if self.head[idx] is not None:
+                dtree.add_node(idx, form=self.form[idx], upos=self.upos[idx], deprel=self.deprel[idx])
+
+        for idx in range(1, len(self.head)):
+            if self.head[idx] is not None:
+                dtree.add_edge(self.head[idx], idx, deprel=self.deprel[idx])
+
+        return nx.freeze(dtree)
 
     def copy(self):
-        return DTree(self.dtree.copy())
+        return DTree(list(self.head), list(self.deprel), list(self.form), list(self.upos),
+                     [list(children) for children in self.children])
+
+    def set_head(self, idx, head, deprel):
+        # rewire the arc of idx to a new head (e.g., when lifting non-projective arcs)
+        old_head = self.head[idx]
+        if old_head is not None:
+            self.children[old_head].remove(idx)
+        insort(self.children[head], idx)
+
+        self.head[idx] = head
+        self.deprel[idx] = deprel
 
     def get_parent(self, child):
-        parent_list = list(self.dtree.predecessors(child))
-        if parent_list:
-            return parent_list[0]
-        else:
-            return None
+        return self.head[child]
 
     def get_children(self, idx, only_edges=None):
         if only_edges is None:
-            return sorted(list(self.dtree.successors(idx)))
+            return list(self.children[idx])
         else:
-            valid_children = list()
-            for child in self.dtree.successors(idx):
-                this_deprel = self.dtree.get_edge_data(idx, child)['deprel']
-                if this_deprel in only_edges:
-                    valid_children.extend([child])
-            return sorted(set(valid_children))
+            return [child for child in self.children[idx] if self.deprel[child] in only_edges]
 
     def get_all_descendants(self, idx):
-        return sorted(nx_dag.descendants(self.dtree, idx))
+        descendants = []
+        stack = list(self.children[idx])
+        while stack:
+            node = stack.pop()
+            descendants.append(node)
+            stack.extend(self.children[node])
+        return sorted(descendants)
 
     def get_deprel(self, idx):
         # get dependency relation with its head
-        parent = list(self.dtree.predecessors(idx))
-        if not parent:
-            return None
-        else:
-            return self.dtree.get_edge_data(parent[0], idx)['deprel']
+        return self.deprel[idx]
 
     def get_pos(self, idx):
-        return self.dtree.nodes[idx]['upos']
+        return self.upos[idx]
 
     def get_form(self, idx):
-        return self.dtree.nodes[idx]['form']
+        return self.form[idx]
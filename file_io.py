@@ -0,0 +1,80 @@
+import gzip
+import lzma
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# compression name -> file name suffix
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+
+
+def available_compressions():
+    return [compression for compression in COMPRESSION_SUFFIXES if compression != 'zstd' or zstandard is not None]
+
+
+def compression_of(path):
+    # compression implied by the file name, None for plain files
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def strip_compression_suffix(path):
+    compression = compression_of(path)
+    if compression is None:
+        return path
+    return path[:-len(COMPRESSION_SUFFIXES[compression])]
+
+
+def open_text(path, mode='r', compression='infer'):
+    # open a plain, gzip, xz or zstd file in text mode; by default the compression follows the file name
+    return _open(path, mode + 't', compression)
+
+
+def open_binary(path, mode='r', compression='infer'):
+    # same as open_text, in binary mode; seeking in compressed files decompresses up to the target offset
+    return _open(path, mode + 'b', compression)
+
+
+def _open(path, mode, compression):
+    if compression == 'infer':
+        compression = compression_of(path)
+
+    if compression is None:
+        return open(path, mode)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == 'xz':
+        return lzma.open(path, mode)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstd compression requires the zstandard package: {}'.format(path))
+        return zstandard.open(path, mode)
+    raise ValueError('unknown compression: {}'.format(compression))
+
+
+class BlockWriter:
+    # collects text blocks and writes them to f in large batches; call flush before closing f
+    __slots__ = ('f', 'buffer_size', 'blocks', 'size')
+
+    def __init__(self, f, buffer_size=1 << 20):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.blocks = []
+        self.size = 0
+
+    def write(self, block):
+        self.blocks.append(block)
+        self.size += len(block)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.blocks:
+            self.f.write(''.join(self.blocks))
+            self.blocks = []
+            self.size = 0
@@ -1,51 +1,72 @@
 import os
+import re
+import json
+import hashlib
+import time
 import argparse
-import networkx as nx
+from collections import deque
 from pathlib import Path
-from data_loader import read_conllu
+from data_loader import iter_conllu_bulk, iter_conllu_blocks
 from dtree import DTree
-from btree import BTree
+from btree import BTree, get_obliqueness_hierarchy, get_obliqueness_hierarchy_path, set_obliqueness_hierarchy_path
+from crossing import arc_spans, is_projective
+from projectivizer import lift_non_projective
+from manifest import Manifest, file_hash
+from sentence_cache import SentenceCache
+from profiling import ConversionStats, StageTimer, StatsRecorder
+from bintree import BinTreeWriter, tree_record
+from conllu_index import get_index, parse_shard, select_shard, select_sent_ids
+from validation import ON_ERROR_POLICIES, Quarantine, quarantine_path, validate_sentence
+from file_io import COMPRESSION_SUFFIXES, BlockWriter, available_compressions, open_text, strip_compression_suffix
+
+
+# bump whenever a change alters the converted output, so that the export manifest rebuilds old files
+CONVERTER_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+
+# text: .binarized s-expressions, binary: .bintree files, both: a .bintree next to every .binarized file
+OUTPUT_FORMATS = ('text', 'binary', 'both')
+
+BRACKET_PATTERN = re.compile(r'[()]')
 
 
 class TRange:
+    __slots__ = ('start_idx', 'end_idx', 'type_changed')
+
     def __init__(self, start_idx, end_idx, type_changed=False):
         self.start_idx = start_idx
         self.end_idx = end_idx
         self.type_changed = type_changed
 
     def __repr__(self):
-        return ':'.join([str(self.start_idx), str(self.end_idx)])
-
-    def __key(self):
-        return self.__repr__()
+        return '{}:{}'.format(self.start_idx, self.end_idx)
 
     def __hash__(self):
-        return hash(self.__key())
+        # type_changed does not take part in hashing, only in equality
+        return hash((self.start_idx, self.end_idx))
 
     def __eq__(self, other):
         if isinstance(other, TRange):
-            if (self.type_changed and other.type_changed) or (not self.type_changed and not other.type_changed):
-                return self.__key() == other.__key()
-            else:
-                return False
+            return (self.start_idx == other.start_idx and self.end_idx == other.end_idx
+                    and bool(self.type_changed) == bool(other.type_changed))
         return NotImplemented
 
     def contains(self, idx):
         # both start and end indices are inclusive
-        if self.start_idx <= idx <= self.end_idx:
-            return True
-        else:
-            return False
+        return self.start_idx <= idx <= self.end_idx
 
     def contains_range(self, tr):
         # both start and end indices are inclusive
-        if self.start_idx <= tr.start_idx and self.end_idx >= tr.end_idx:
-            return True
-        else:
-            return False
+        return self.start_idx <= tr.start_idx and self.end_idx >= tr.end_idx
 
     @staticmethod
     def merge_range(tr1, tr2):
+        # reuse tr1 or tr2 if it already covers the other
+        if not tr1.type_changed and tr1.contains_range(tr2):
+            return tr1
+        if not tr2.type_changed and tr2.contains_range(tr1):
+            return tr2
         return TRange(min(tr1.start_idx, tr2.start_idx), max(tr1.end_idx, tr2.end_idx))
 
     @staticmethod
@@ -59,240 +80,586 @@ class TRange:
 
 
 def check_cross_dependencies(sentence):
-    range_list = []
-
-    for token in sentence:
-        token_idx = token.idx
-        token_head = token.head
-        new_range = TRange(min(token_idx, token_head), max(token_idx, token_head))
+    # whether any two arcs of the sentence cross
+    return not is_projective(arc_spans(sentence))
 
-        for r in range_list:
-            # if not one range contains the other
-            if not new_range.contains_range(r) and not r.contains_range(new_range):
-                if (max(new_range.start_idx, r.start_idx) - min(new_range.end_idx, r.end_idx)) < 0:
-                    return True
 
-        range_list.append(new_range)
-
-    return False
+def sexp_description(tag, content=None, is_head=False):
+    # remove '*' from lifted deprel
+    if tag is not None:
+        tag = tag.replace('*', '')
 
+    if content is None:
+        if is_head:
+            return '{}-H'.format(tag)
+        else:
+            return '{}'.format(tag)
+    else:
+        # to avoid conflicts with sexp's parentheses
+        content = content.replace('(', '-LRB-')
+        content = content.replace(')', '-RRB-')
+
+        if is_head:
+            return '{}-H {}'.format(tag, content)
+        else:
+            return '{} {}'.format(tag, content)
 
-def to_sexp(dtree, btree, head_map):
-    class Description:
-        def __init__(self, tag, content=None, is_head=False):
-            self.tag = tag
-            self.content = content
-            self.is_head = is_head
-
-            # to avoid conflicts with sexp's parentheses
-            if self.content is not None:
-                self.content = self.content.replace('(', '-LRB-')
-                self.content = self.content.replace(')', '-RRB-')
-
-            # remove '*' from lifted deprel
-            if self.tag is not None:
-                self.tag = self.tag.replace('*', '')
-
-        def __repr__(self):
-            if self.content is None:
-                if self.is_head:
-                    return '{}-H'.format(self.tag)
-                else:
-                    return '{}'.format(self.tag)
-            else:
-                if self.is_head:
-                    return '{}-H {}'.format(self.tag, self.content)
-                else:
-                    return '{} {}'.format(self.tag, self.content)
-
-    class Node:
-        def __init__(self, description, left_child=None, right_child=None):
-            self.description = description
-            self.left_child = left_child
-            self.right_child = right_child
-
-        def __repr__(self):
-            if self.left_child is not None and self.right_child is not None:
-                template = '({} {}{})'
-                return template.format(self.description,
-                                       self.left_child,
-                                       self.right_child)
-            else:
-                return '({})'.format(self.description)
 
-    # for each node in btree
-    # - get index of its head from dtree
-    # - check if its head is in the left branch or right branch
-    # - assign H to the branch that contains its head
+def write_sexp(dtree, btree, head_map, write, pretty=False):
+    # emit the s-expression of btree through write (e.g., list.append or file.write);
+    # with pretty=True the output is the same as pprint_sexp(to_sexp(...))
+    name = btree.name
+    idx = btree.idx
+    left = btree.left
+    right = btree.right
     btree_root = btree.get_root()
 
-    def _traverse(btree_node, is_head=False):
-        # get idx of current node
-        idx = btree.btree.nodes[btree_node]['idx']
-
-        # get head_idx of current node
-        head_idx = head_map[idx]
-
-        children = btree.get_children(btree_node)
-        if children:
-            if btree.btree.nodes[children[0]]['idx'] < btree.btree.nodes[children[1]]['idx']:
-                left_child = children[0]
-                right_child = children[1]
-            else:
-                left_child = children[1]
-                right_child = children[0]
-
-            description = Description(tag=btree.btree.nodes[btree_node]['name'], is_head=is_head)
-
-            # get idx of all descendants' heads
-            def get_all_descendants_idx(node):
-                idx_set = set()
-                idx_set.add(btree.btree.nodes[node]['idx'])
-                descendants = btree.get_all_descendants(node)
-                for descendant in descendants:
-                    idx_set.add(btree.btree.nodes[descendant]['idx'])
-
-                return idx_set
-
-            # check which branch the head of current node belongs to
-            if head_idx in get_all_descendants_idx(left_child):
-                return Node(description,
-                            _traverse(left_child, is_head=True),
-                            _traverse(right_child))
+    # H marks the branch that contains the head in the original tree
+    is_head = btree.layout(head_map)[3]
+
+    # stack holds node ids and pending strings (closing brackets and line breaks)
+    column = 0
+    stack = [btree_root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            write(item)
+            if item[0] == '\n':
+                column = len(item) - 1
             else:
-                return Node(description,
-                            _traverse(left_child),
-                            _traverse(right_child, is_head=True))
+                column += len(item)
+            continue
+
+        node = item
+        if left[node] != -1:
+            chunk = '(' + sexp_description(name[node], is_head=is_head[node]) + ' '
+            write(chunk)
+            column += len(chunk)
+
+            stack.append(')')
+            stack.append(right[node])
+            if pretty:
+                # right child starts on a new line, aligned with the left child
+                stack.append('\n' + ' ' * column)
+            stack.append(left[node])
         else:
-            upos = dtree.get_pos(idx)
-            description = Description(tag=upos, content=btree.btree.nodes[btree_node]['name'], is_head=is_head)
-            return Node(description)
+            upos = dtree.get_pos(idx[node])
+            chunk = '(' + sexp_description(upos, content=name[node], is_head=is_head[node]) + ')'
+            write(chunk)
+            column += len(chunk)
 
-    sexp_root = _traverse(btree_root, is_head=False)
 
-    return str(sexp_root)
+def to_sexp(dtree, btree, head_map):
+    buffer = []
+    write_sexp(dtree, btree, head_map, buffer.append)
+    return ''.join(buffer)
+
 
+def pprint_sexp(sexp, out=None):
+    # break the line after a closing bracket that is followed by a sibling and
+    # indent the sibling to the column of the bracket just closed;
+    # chunks go to out.write if out is given, otherwise the pretty string is returned
+    chunks = []
+    write = chunks.append if out is None else out.write
 
-def pprint_sexp(sexp):
-    pretty_sexp = ''
     opening_brackets = list()
     break_point = 0
     offset = 0
-    for i in range(len(sexp)-1):
+    last = len(sexp) - 1
+    for match in BRACKET_PATTERN.finditer(sexp):
+        i = match.start()
         if sexp[i] == '(':
             opening_brackets.append(i-offset)
-        elif sexp[i] == ')':
-            if sexp[i+1] == ')':
-                try:
-                    opening_brackets.pop()
-                except IndexError:
-                    print(i)
-                    print(sexp)
+            continue
+
+        if not opening_brackets:
+            raise ValueError('unbalanced s-expression: unexpected ")" at position {}: {}'.format(i, sexp))
+        last_opening_bracket = opening_brackets.pop()
+
+        if i < last and sexp[i+1] != ')':
+            write(sexp[break_point:i+1])
+            write('\n' + ' '*last_opening_bracket)
+            offset = i-last_opening_bracket+1
+            break_point = i+1
+
+    if opening_brackets:
+        raise ValueError('unbalanced s-expression: {} unclosed "(": {}'.format(len(opening_brackets), sexp))
+
+    write(sexp[break_point:])
+
+    if out is None:
+        return ''.join(chunks)
+
+
+def sentence_sexp(ud_sentence, use_pseudo_projective=False, cache=None, stats=None, obliqueness_hierarchy=None,
+                  add_record=None, text=True):
+    # pretty-printed s-expression of a single UDSentence;
+    # add_record, if given, receives the bintree.tree_record of the sentence (the cache is not used then),
+    # and with text=False no s-expression is built and None is returned
+    sentence = ud_sentence.sentence
+    sent_id = ud_sentence.sent_id
+
+    timer = StageTimer(stats) if stats is not None else None
+
+    # reuse the s-expression of an identical sentence converted before
+    if cache is not None and add_record is None:
+        cache_key = cache.key(sentence)
+        sexp = cache.get(cache_key)
+        if timer is not None:
+            timer.lap('cache')
+        if sexp is not None:
+            if stats is not None:
+                stats.add_sentence(sent_id, len(sentence), timer.elapsed(), cached=True)
+            return sexp
+
+    # create a map of dependent_idx -> head_idx
+    head_map = dict()
+    for token in sentence:
+        head_map[token.idx] = token.head
+
+    # store UD data in a dependency tree data structure
+    dtree = DTree.from_sentence(sentence)
+    if timer is not None:
+        timer.lap('dtree')
+
+    # check projectivity; without lifting it is only needed for statistics
+    non_projective = False
+    lift_stats = None
+    if use_pseudo_projective or stats is not None:
+        non_projective = check_cross_dependencies(sentence)
+        if timer is not None:
+            timer.lap('projectivity')
+
+    if use_pseudo_projective and non_projective:
+        lift_stats = lift_non_projective(dtree)
+        if timer is not None:
+            timer.lap('lifting')
+
+    # convert dtree to binary tree
+    btree = BTree.from_dtree(dtree, obliqueness_hierarchy)
+    if timer is not None:
+        timer.lap('btree')
+
+    if add_record is not None:
+        add_record(tree_record(ud_sentence, dtree, btree, head_map))
+        if timer is not None:
+            timer.lap('record')
+
+    # convert to pretty-printed s-expression
+    sexp = None
+    if text:
+        buffer = []
+        write_sexp(dtree, btree, head_map, buffer.append, pretty=True)
+        sexp = ''.join(buffer)
+
+        if cache is not None and add_record is None:
+            cache.put(cache_key, sexp)
+
+    if stats is not None:
+        timer.lap('sexp')
+        stats.add_sentence(sent_id, len(sentence), timer.elapsed(), non_projective, lift_stats)
+
+    return sexp
+
+
+def binarize_sentence(ud_sentence, use_pseudo_projective=False, cache=None, stats=None, obliqueness_hierarchy=None,
+                      add_record=None, text=True):
+    # block of a .binarized file: sent_id and text comments followed by the s-expression ('' with text=False)
+    sexp = sentence_sexp(ud_sentence, use_pseudo_projective, cache=cache, stats=stats,
+                         obliqueness_hierarchy=obliqueness_hierarchy, add_record=add_record, text=text)
+    if sexp is None:
+        return ''
+    header = '# sent_id = {}\n# text = {}\n'.format(ud_sentence.sent_id, ud_sentence.text)
+    return header + sexp + '\n\n'
+
+
+def checked_binarize_sentence(ud_sentence, use_pseudo_projective=False, cache=None, stats=None, add_record=None,
+                              text=True, on_error=None):
+    # binarize_sentence after validate_sentence; returns the block and None, or '' and the reason the
+    # sentence was rejected with on_error skip/quarantine, where conversion errors are caught as well;
+    # with on_error fail both kinds of error raise a ValueError naming the sentence, and
+    # with on_error None sentences are converted unchecked, as before validation existed
+    reason = validate_sentence(ud_sentence.sentence, get_obliqueness_hierarchy()) if on_error is not None else None
+    error = None
+    if reason is None:
+        try:
+            block = binarize_sentence(ud_sentence, use_pseudo_projective, cache=cache, stats=stats,
+                                      add_record=add_record, text=text)
+            return block, None
+        except Exception as e:
+            if on_error is None:
+                raise
+            reason = 'conversion failed: {}: {}'.format(type(e).__name__, e)
+            error = e
+
+    if on_error == 'fail':
+        raise ValueError('cannot binarize sentence {}: {}'.format(ud_sentence.sent_id, reason)) from error
+    return '', reason
+
+
+# sentence cache of a worker process, set up by init_worker
+worker_cache = None
+
+
+def init_worker(cache_config=None, hierarchy_path=None):
+    global worker_cache
+    if hierarchy_path is not None:
+        set_obliqueness_hierarchy_path(hierarchy_path)
+    if cache_config is not None:
+        worker_cache = SentenceCache(**cache_config)
+
+
+def flush_worker_cache():
+    # commit the worker's cache and return its hits and misses since the last call
+    if worker_cache is None:
+        return 0, 0
+    worker_cache.flush()
+    return worker_cache.take_counts()
+
+
+def binarize_chunk(ud_sentences, use_pseudo_projective=False, record_stats=False, output_format='text',
+                   on_error=None):
+    # runs in a worker process; returns the converted text, the cache hits and misses,
+    # a StatsRecorder of the chunk if record_stats is set, the bintree records for binary output
+    # and (position in the chunk, reason) of every rejected sentence
+    stats = StatsRecorder() if record_stats else None
+    records = [] if output_format != 'text' else None
+    add_record = records.append if records is not None else None
+
+    blocks = []
+    rejected = []
+    for position, ud_sentence in enumerate(ud_sentences):
+        block, reason = checked_binarize_sentence(ud_sentence, use_pseudo_projective, cache=worker_cache,
+                                                  stats=stats, add_record=add_record,
+                                                  text=output_format != 'binary', on_error=on_error)
+        blocks.append(block)
+        if reason is not None:
+            rejected.append((position, reason))
+
+    return ''.join(blocks), flush_worker_cache(), stats, records, rejected
+
+
+def ud_binarize_worker(in_path, out_path, use_pseudo_projective=False, record_stats=False, output_format='text',
+                       sent_ids=None, shard=None, on_error=None):
+    # runs in a worker process; returns the cache hits and misses, a StatsRecorder if record_stats is set
+    # and the number of rejected sentences
+    stats = StatsRecorder() if record_stats else None
+    n_rejected = ud_binarize(in_path, out_path, use_pseudo_projective, cache=worker_cache, stats=stats,
+                             output_format=output_format, sent_ids=sent_ids, shard=shard, on_error=on_error)
+    return flush_worker_cache(), stats, n_rejected
+
+
+def iter_chunks(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def bintree_path(out_path):
+    # .bintree written next to a .binarized file with output format both
+    return os.path.splitext(strip_compression_suffix(out_path))[0] + '.bintree'
+
+
+def select_sentences(in_path, sent_ids=None, shard=None):
+    # stream all sentences of in_path or, with a set of sent_ids and/or a (shard, n_shards) pair,
+    # only the selected ones, which are read through the offset index of in_path
+    if sent_ids is None and shard is None:
+        return iter_conllu_bulk(in_path)
+
+    entries = get_index(in_path)
+    if shard is not None:
+        entries = select_shard(entries, *shard)
+    if sent_ids is not None:
+        entries = select_sent_ids(entries, sent_ids)
+    return iter_conllu_blocks(in_path, entries)
+
+
+def ud_binarize(in_path, out_path, use_pseudo_projective=False, jobs=1, chunk_size=1000, cache=None, stats=None,
+                output_format='text', sent_ids=None, shard=None, on_error=None):
+    # pass a ConversionStats (or a subclass) as stats to collect per-stage timings and per-file rates;
+    # with output_format binary, out_path is the .bintree file; see select_sentences for sent_ids and shard
+    # and validation.ON_ERROR_POLICIES for on_error; returns the number of rejected sentences
+    start = time.perf_counter()
+    n_sentences = 0
+    n_tokens = 0
+
+    rejected = []
+    quarantine = Quarantine(quarantine_path(out_path), in_path) if on_error == 'quarantine' else None
+
+    def _reject(ud_sentence, reason):
+        rejected.append(reason)
+        if quarantine is not None:
+            quarantine.add(ud_sentence, reason)
+
+    text = output_format != 'binary'
+    bin_writer = None
+    if output_format != 'text':
+        bin_writer = BinTreeWriter(out_path if output_format == 'binary' else bintree_path(out_path))
+    add_record = bin_writer.add if bin_writer is not None else None
+
+    # the .bintree and quarantine files are closed even if the conversion stops with an error (on_error fail),
+    # so that the .bintree gets a valid header and the quarantine file is flushed
+    try:
+        # stream UD data sentence by sentence
+        ud_sentences = select_sentences(in_path, sent_ids, shard)
+
+        # the output is compressed if out_path ends with .gz, .xz or .zst; binary-only output discards the text
+        with open_text(out_path, 'w') if text else open(os.devnull, 'w') as f_out:
+            if jobs <= 1:
+                # sentence blocks are collected and written in large batches
+                writer = BlockWriter(f_out)
+                if stats is None:
+                    for ud_sentence in ud_sentences:
+                        block, reason = checked_binarize_sentence(ud_sentence, use_pseudo_projective, cache=cache,
+                                                                  add_record=add_record, text=text,
+                                                                  on_error=on_error)
+                        writer.write(block)
+                        if reason is not None:
+                            _reject(ud_sentence, reason)
+                    writer.flush()
+                else:
+                    timer = StageTimer(stats)
+                    for ud_sentence in ud_sentences:
+                        timer.lap('read')
+                        block, reason = checked_binarize_sentence(ud_sentence, use_pseudo_projective, cache=cache,
+                                                                  stats=stats, add_record=add_record, text=text,
+                                                                  on_error=on_error)
+                        timer.last = time.perf_counter()
+                        writer.write(block)
+                        if reason is not None:
+                            _reject(ud_sentence, reason)
+                        timer.lap('write')
+
+                        n_sentences += 1
+                        n_tokens += len(ud_sentence.sentence)
+                    timer.lap('read')
+                    writer.flush()
+                    timer.lap('write')
             else:
-                last_opening_bracket = opening_brackets.pop()
-                pretty_sexp = pretty_sexp + sexp[break_point:i+1] + '\n' + ' '*last_opening_bracket
-                offset = i-last_opening_bracket+1
-                break_point = i+1
-    pretty_sexp += sexp[break_point:]
-    return pretty_sexp
-
-
-def ud_binarize(in_path, out_path, use_pseudo_projective=False):
-    # read UD data
-    ud_sentences = read_conllu(in_path)
-
-    with open(out_path, 'w') as f_out:
-        for ud_sentence in ud_sentences:
-            sentence = ud_sentence.sentence
-            sent_id = ud_sentence.sent_id
-            text = ud_sentence.text
-
-            # create a map of dependent_idx -> head_idx
-            head_map = dict()
-            for token in sentence:
-                head_map[token.idx] = token.head
-
-            # store UD data in a dependency tree data structure
-            dtree = DTree.from_sentence(sentence)
-
-            # check projectivity
-            if check_cross_dependencies(sentence) and use_pseudo_projective:
-                dtree_root = dtree.get_children(0)[0]
-                bottom_up = list()
-                range_list = list()
-
-                # top-down traverse
-                # save arcs that cross previously traversed arcs
-                def _traverse(dtree, parent):
-                    # get immediate children
-                    children = dtree.get_children(parent)
-
-                    for child in children:
-                        this_range = TRange(min(child, parent), max(child, parent))
-
-                        for r in range_list:
-                            # if not one range contains the other
-                            if not this_range.contains_range(r) and not r.contains_range(this_range):
-                                if (max(this_range.start_idx, r.start_idx) - min(this_range.end_idx, r.end_idx)) < 0:
-                                    if child not in bottom_up:
-                                        bottom_up.append(child)
-
-                        range_list.append(this_range)
-
-                    # recursion
-                    for child in children:
-                        _traverse(dtree, child)
-
-                _traverse(dtree, dtree_root)
-
-                # traverse crossing arcs from bottom-up
-                for n in reversed(bottom_up):
-                    # get parent of current node
-                    parent = dtree.get_parent(n)
-
-                    range_list.remove(TRange(min(n, parent), max(n, parent)))
-
-                    to_lift = True
-                    final_lift_dest = parent
-
-                    # keep lifting until projective
-                    current_parent = parent
-                    while to_lift:
-                        grandparent = dtree.get_parent(current_parent)
-
-                        if grandparent:
-                            new_range = TRange(min(n, grandparent), max(n, grandparent))
-
-                            is_projective = True
-                            for r in range_list:
-                                # if not one range contains the other
-                                if not new_range.contains_range(r) and not r.contains_range(new_range):
-                                    if (max(new_range.start_idx, r.start_idx) - min(new_range.end_idx, r.end_idx)) < 0:
-                                        is_projective = False
-
-                            if is_projective:
-                                to_lift = False
-                                final_lift_dest = grandparent
-                            else:
-                                current_parent = grandparent
-                        else:
-                            to_lift = False
-
-                    if final_lift_dest != parent:
-                        # mark this deprel as a result of lifting
-                        new_deprel = dtree.tree().nodes[n]['deprel'] + '*'
-                        dtree.tree().add_edge(final_lift_dest, n, deprel=new_deprel)
-                        dtree.tree().remove_edge(parent, n)
-
-            # convert dtree to binary tree
-            btree = BTree.from_dtree(dtree)
-
-            # convert to s-expression
-            sexpr = to_sexp(dtree, btree, head_map)
-
-            f_out.write('# sent_id = {}\n'.format(sent_id))
-            f_out.write('# text = {}\n'.format(text))
-            f_out.write('{}\n\n'.format(pprint_sexp(sexpr)))
+                # convert chunks of sentences on worker processes and write them back in input order;
+                # at most 2 * jobs chunks are in flight so memory stays bounded for any input size;
+                # concurrent.futures is imported here because it is slow to import and serial runs do not need it
+                from concurrent.futures import ProcessPoolExecutor
+
+                cache_config = cache.config() if cache is not None else None
+                with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                         initargs=(cache_config, get_obliqueness_hierarchy_path())) as executor:
+                    pending = deque()
+                    timer = StageTimer(stats) if stats is not None else None
+
+                    def _write_next():
+                        future, chunk = pending.popleft()
+                        chunk_text, (hits, misses), chunk_stats, records, chunk_rejected = future.result()
+                        if timer is not None:
+                            timer.last = time.perf_counter()
+                        f_out.write(chunk_text)
+                        if records is not None:
+                            for record in records:
+                                bin_writer.add(record)
+                        for position, reason in chunk_rejected:
+                            _reject(chunk[position], reason)
+                        if timer is not None:
+                            timer.lap('write')
+                        if cache is not None:
+                            cache.hits += hits
+                            cache.misses += misses
+                        if stats is not None:
+                            stats.replay(chunk_stats)
+
+                    for chunk in iter_chunks(ud_sentences, chunk_size):
+                        if timer is not None:
+                            timer.lap('read')
+                        future = executor.submit(binarize_chunk, chunk, use_pseudo_projective,
+                                                 record_stats=stats is not None, output_format=output_format,
+                                                 on_error=on_error)
+                        pending.append((future, chunk))
+                        n_sentences += len(chunk)
+                        n_tokens += sum(len(ud_sentence.sentence) for ud_sentence in chunk)
+
+                        if len(pending) >= 2 * jobs:
+                            _write_next()
+
+                    while pending:
+                        _write_next()
+    finally:
+        if bin_writer is not None:
+            bin_writer.close()
+
+        if quarantine is not None:
+            quarantine.close()
+
+    if stats is not None:
+        stats.add_file(in_path, n_sentences, n_tokens, time.perf_counter() - start)
+
+    return len(rejected)
+
+
+def find_conllu_files(ud_path):
+    # every .conllu file under ud_path (also .conllu.gz, .conllu.xz and .conllu.zst), in conversion order
+    conllu_paths = []
+    for root, subdirs, files in sorted(os.walk(ud_path)):
+        for file in files:
+            if strip_compression_suffix(file).endswith('.conllu'):
+                conllu_paths.append(os.path.join(root, file))
+    return conllu_paths
+
+
+def find_treebank_files(ud_path, export_path, compression=None, output_format='text', shard=None, sent_ids=None):
+    # pair every .conllu file under ud_path (also .conllu.gz, .conllu.xz and .conllu.zst)
+    # with its .binarized destination, which gets the suffix of compression, or its .bintree destination;
+    # the output of a shard is named e.g. x.shard-0-of-4.binarized and the output of a sent_ids selection
+    # e.g. x.sel-1a2b3c4d.binarized, so that a subset never overwrites the full treebank
+    file_pairs = []
+    out_suffix = '.binarized' + COMPRESSION_SUFFIXES[compression] if compression is not None else '.binarized'
+    if output_format == 'binary':
+        out_suffix = '.bintree'
+    if sent_ids is not None:
+        out_suffix = '.sel-{}'.format(sent_ids_digest(sent_ids)[:8]) + out_suffix
+    if shard is not None:
+        out_suffix = '.shard-{}-of-{}'.format(*shard) + out_suffix
+
+    for root, subdirs, files in sorted(os.walk(ud_path)):
+        dirpath, dirname = os.path.split(root)
+        current_export_path = os.path.join(export_path, dirname)
+
+        for file in files:
+            if strip_compression_suffix(file).endswith('.conllu'):
+                filename = os.path.splitext(strip_compression_suffix(file))[0]
+
+                conllu_path = os.path.join(root, file)
+                Path(current_export_path).mkdir(parents=True, exist_ok=True)
+                binarized_path = os.path.join(current_export_path, filename + out_suffix)
+
+                file_pairs.append((conllu_path, binarized_path))
+
+    return file_pairs
+
+
+def conversion_settings(use_pseudo_projective, hierarchy_hash):
+    # settings string that keys the sentence cache next to the token rows
+    return '{}:{}:{}'.format(CONVERTER_VERSION, hierarchy_hash, use_pseudo_projective)
+
+
+def conversion_record(conllu_path, use_pseudo_projective, hierarchy_hash, output_format='text', selection=None,
+                      on_error=None):
+    # everything that determines the content of a converted file
+    record = {'input_sha256': file_hash(conllu_path),
+              'hierarchy_sha256': hierarchy_hash,
+              'use_pseudo_projective': use_pseudo_projective,
+              'converter_version': CONVERTER_VERSION}
+    # text records keep their old form so that existing manifests stay valid
+    if output_format != 'text':
+        record['output_format'] = output_format
+    if selection is not None:
+        record['selection'] = selection
+    if on_error is not None:
+        record['on_error'] = on_error
+    return record
+
+
+def sent_ids_digest(sent_ids):
+    return hashlib.sha256('\n'.join(sorted(sent_ids)).encode('utf-8')).hexdigest()
+
+
+def selection_description(sent_ids=None, shard=None):
+    # manifest entry of the --sent-ids/--shard selection, None if all sentences are converted
+    parts = []
+    if shard is not None:
+        parts.append('shard {}/{}'.format(*shard))
+    if sent_ids is not None:
+        parts.append('sent_ids {}'.format(sent_ids_digest(sent_ids)))
+    return ', '.join(parts) if parts else None
+
+
+def ud_binarize_files(file_pairs, use_pseudo_projective=False, jobs=1, sentence_jobs=1, chunk_size=1000,
+                      manifest=None, force=False, cache=None, stats=None, output_format='text',
+                      sent_ids=None, shard=None, on_error=None):
+    # with a manifest, files whose input and settings did not change since the last run are skipped;
+    # with sent_ids, files that contain none of them are left out
+    if sent_ids is not None:
+        file_pairs = [(conllu_path, binarized_path) for conllu_path, binarized_path in file_pairs
+                      if select_sent_ids(get_index(conllu_path), sent_ids)]
+
+    selection = selection_description(sent_ids, shard)
+    records = dict()
+    if manifest is not None:
+        hierarchy_hash = file_hash(get_obliqueness_hierarchy_path())
+
+        outdated_pairs = []
+        for conllu_path, binarized_path in file_pairs:
+            records[binarized_path] = conversion_record(conllu_path, use_pseudo_projective, hierarchy_hash,
+                                                        output_format=output_format, selection=selection,
+                                                        on_error=on_error)
+            # with output format both, the .bintree is written next to the .binarized file
+            other_paths = [bintree_path(binarized_path)] if output_format == 'both' else []
+            if force or not manifest.is_up_to_date(binarized_path, records[binarized_path], other_paths):
+                outdated_pairs.append((conllu_path, binarized_path))
+
+        n_skipped = len(file_pairs) - len(outdated_pairs)
+        file_pairs = outdated_pairs
+
+    n_rejected = 0
+
+    def _done(conllu_path, binarized_path, n_file_rejected):
+        nonlocal n_rejected
+        n_rejected += n_file_rejected
+        if n_file_rejected:
+            print('Rejected {} invalid sentence(s) in {}'.format(n_file_rejected, conllu_path))
+        if manifest is not None:
+            manifest.update(binarized_path, records[binarized_path])
+
+    if jobs <= 1:
+        for conllu_path, binarized_path in file_pairs:
+            print('Binarizing {}'.format(conllu_path))
+
+            n_file_rejected = ud_binarize(conllu_path, binarized_path, use_pseudo_projective, jobs=sentence_jobs,
+                                          chunk_size=chunk_size, cache=cache, stats=stats,
+                                          output_format=output_format, sent_ids=sent_ids, shard=shard,
+                                          on_error=on_error)
+            _done(conllu_path, binarized_path, n_file_rejected)
+    else:
+        # schedule the largest treebanks first so that a huge file does not finish last
+        file_pairs = sorted(file_pairs, key=lambda pair: os.path.getsize(pair[0]), reverse=True)
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        cache_config = cache.config() if cache is not None else None
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(cache_config, get_obliqueness_hierarchy_path())) as executor:
+            futures = dict()
+            for conllu_path, binarized_path in file_pairs:
+                future = executor.submit(ud_binarize_worker, conllu_path, binarized_path, use_pseudo_projective,
+                                         record_stats=stats is not None, output_format=output_format,
+                                         sent_ids=sent_ids, shard=shard, on_error=on_error)
+                futures[future] = (conllu_path, binarized_path)
+
+            for n_done, future in enumerate(as_completed(futures), start=1):
+                # re-raise errors from worker processes
+                (hits, misses), file_stats, n_file_rejected = future.result()
+                if cache is not None:
+                    cache.hits += hits
+                    cache.misses += misses
+                if stats is not None:
+                    stats.replay(file_stats)
+
+                conllu_path, binarized_path = futures[future]
+                print('Binarized [{}/{}] {}'.format(n_done, len(futures), conllu_path))
+                _done(conllu_path, binarized_path, n_file_rejected)
+
+    if manifest is not None:
+        print('Rebuilt {} file(s), skipped {} unchanged file(s)'.format(len(file_pairs), n_skipped))
+
+    if cache is not None:
+        print('Sentence cache: {} hit(s), {} miss(es)'.format(cache.hits, cache.misses))
+
+    if n_rejected:
+        print('Rejected {} invalid sentence(s) in total'.format(n_rejected))
 
 
 if __name__ == '__main__':
@@ -302,31 +669,135 @@ if __name__ == '__main__':
     parser.add_argument('--ud-path', action='store', dest='ud_path', required=True,
                         help='path to UD directory (e.g.: ud-treebanks-v2.8)')
 
-    parser.add_argument('--export-path', action='store', dest='export_path', required=True,
-                        help='where converted treebanks should be stored')
+    parser.add_argument('--export-path', action='store', dest='export_path', default=None,
+                        help='where converted treebanks should be stored (required unless --analyze-only is given)')
+
+    parser.add_argument('--analyze-only', action='store_true', default=False, dest='analyze_only',
+                        help='print projectivity, depth, arc length and deprel statistics of every treebank file '
+                             'instead of converting (requires numpy); --stats-json saves them as JSON')
 
     parser.add_argument('--use-pseudo-projective', action='store_true', default=False,
                         dest='use_pseudo_projective',
                         help='apply pseudo-projective approach to binarize non-projective trees')
 
+    parser.add_argument('--obliqueness-hierarchy', action='store', default=None, dest='obliqueness_hierarchy',
+                        help='JSON file with deprel priorities (default: ud2-obliqueness-hierarchy.json next to btree.py)')
+
+    parser.add_argument('--jobs', action='store', type=int, default=1, dest='jobs',
+                        help='number of treebank files converted in parallel (default: 1)')
+
+    parser.add_argument('--sentence-jobs', action='store', type=int, default=1, dest='sentence_jobs',
+                        help='number of processes converting sentence chunks within one file (default: 1)')
+
+    parser.add_argument('--chunk-size', action='store', type=int, default=1000, dest='chunk_size',
+                        help='number of sentences per chunk when --sentence-jobs > 1 (default: 1000)')
+
+    parser.add_argument('--cache-size', action='store', type=int, default=0, dest='cache_size',
+                        help='number of binarized sentences kept in an in-memory LRU cache (default: 0, disabled)')
+
+    parser.add_argument('--cache-db', action='store', default=None, dest='cache_db',
+                        help='SQLite file that persists the sentence cache across runs')
+
+    parser.add_argument('--compress', action='store', default=None, choices=sorted(COMPRESSION_SUFFIXES),
+                        dest='compress',
+                        help='compress the .binarized files (zstd needs the zstandard package)')
+
+    parser.add_argument('--output-format', action='store', default='text', choices=OUTPUT_FORMATS,
+                        dest='output_format',
+                        help='text: .binarized s-expressions, binary: .bintree files, both: both (default: text)')
+
+    parser.add_argument('--sent-ids', action='store', default=None, dest='sent_ids',
+                        help='convert only these sentences: comma-separated sent_ids, or @FILE with one sent_id per line')
+
+    parser.add_argument('--shard', action='store', default=None, type=parse_shard, dest='shard',
+                        help='convert only shard i of N (i/N, counting from 0) of the sentences of every file')
+
+    parser.add_argument('--on-error', action='store', default=None, choices=ON_ERROR_POLICIES, dest='on_error',
+                        help='validate every sentence; invalid sentences (cycle, no or several root children, unknown '
+                             'head or deprel) and conversion errors abort the run (fail), are left out (skip) or are '
+                             'left out and written to x.quarantine.conllu next to the output with the reason '
+                             '(quarantine); by default sentences are not validated')
+
+    parser.add_argument('--profile', action='store_true', default=False, dest='profile',
+                        help='print time per stage, per-file rates and the slowest sentences at the end')
+
+    parser.add_argument('--stats-json', action='store', default=None, dest='stats_json',
+                        help='write the same statistics as --profile to this JSON file')
+
+    parser.add_argument('--slowest', action='store', type=int, default=10, dest='n_slowest',
+                        help='number of slowest sentences reported by --profile/--stats-json (default: 10)')
+
+    parser.add_argument('--force', action='store_true', default=False, dest='force',
+                        help='rebuild all files, even those the export manifest reports as up to date')
+
     args = parser.parse_args()
 
+    if args.analyze_only:
+        # numpy is only imported for the analysis
+        from analysis import np, analyze_treebank, analysis_report
+        if np is None:
+            parser.error('--analyze-only requires numpy')
+
+        analyses = []
+        for conllu_path in find_conllu_files(args.ud_path):
+            analyses.append(analyze_treebank(conllu_path))
+            print(analysis_report(analyses[-1]))
+
+        if args.stats_json is not None:
+            with open(args.stats_json, 'w') as f:
+                json.dump(analyses, f, indent=2)
+        parser.exit()
+
+    if args.export_path is None:
+        parser.error('--export-path is required unless --analyze-only is given')
+
+    if args.jobs > 1 and args.sentence_jobs > 1:
+        parser.error('--jobs and --sentence-jobs cannot both be greater than 1')
+
+    if args.compress is not None and args.compress not in available_compressions():
+        parser.error('--compress {} is not available; install the zstandard package'.format(args.compress))
+
     ud_path = args.ud_path
     export_path = args.export_path
     use_pseudo_projective = args.use_pseudo_projective
 
-    for root, subdirs, files in sorted(os.walk(ud_path)):
-        dirpath, dirname = os.path.split(root)
-        current_export_path = os.path.join(export_path, dirname)
+    if args.obliqueness_hierarchy is not None:
+        set_obliqueness_hierarchy_path(args.obliqueness_hierarchy)
 
-        for file in files:
-            if file.endswith('.conllu'):
-                filename = os.path.splitext(file)[0]
+    sent_ids = None
+    if args.sent_ids is not None:
+        if args.sent_ids.startswith('@'):
+            with open(args.sent_ids[1:], 'r') as f:
+                sent_ids = set(line.strip() for line in f if line.strip())
+        else:
+            sent_ids = set(sent_id for sent_id in args.sent_ids.split(',') if sent_id)
 
-                conllu_path = os.path.join(root, file)
-                Path(current_export_path).mkdir(parents=True, exist_ok=True)
-                binarized_path = os.path.join(current_export_path, filename + '.binarized')
+    file_pairs = find_treebank_files(ud_path, export_path, compression=args.compress, output_format=args.output_format,
+                                     shard=args.shard, sent_ids=sent_ids)
+
+    Path(export_path).mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(os.path.join(export_path, MANIFEST_NAME))
+
+    cache = None
+    if args.cache_size > 0 or args.cache_db is not None:
+        settings = conversion_settings(use_pseudo_projective, file_hash(get_obliqueness_hierarchy_path()))
+        cache = SentenceCache(settings, args.cache_size, args.cache_db)
+
+    stats = None
+    if args.profile or args.stats_json is not None:
+        stats = ConversionStats(args.n_slowest)
+
+    ud_binarize_files(file_pairs, use_pseudo_projective, jobs=args.jobs, sentence_jobs=args.sentence_jobs,
+                      chunk_size=args.chunk_size, manifest=manifest, force=args.force, cache=cache, stats=stats,
+                      output_format=args.output_format, sent_ids=sent_ids, shard=args.shard,
+                      on_error=args.on_error)
+
+    if args.profile:
+        print(stats.report())
 
-                print('Binarizing {}'.format(conllu_path))
+    if args.stats_json is not None:
+        with open(args.stats_json, 'w') as f:
+            json.dump(stats.to_dict(), f, indent=2)
 
-                ud_binarize(conllu_path, binarized_path, use_pseudo_projective)
+    if cache is not None:
+        cache.close()
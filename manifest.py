@@ -0,0 +1,43 @@
+import os
+import json
+import hashlib
+
+
+def file_hash(path, block_size=1 << 20):
+    # sha256 of the file content, read in blocks
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class Manifest:
+    # record of how each output file in an export directory was produced;
+    # entries are keyed by output path relative to the manifest so the export directory can be moved
+    def __init__(self, path):
+        self.path = path
+        self.entries = dict()
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def key(self, out_path):
+        return os.path.relpath(out_path, os.path.dirname(os.path.abspath(self.path)))
+
+    def is_up_to_date(self, out_path, record, other_paths=()):
+        # other_paths are further files written together with out_path, which must exist as well
+        return (self.entries.get(self.key(out_path)) == record and os.path.exists(out_path)
+                and all(os.path.exists(path) for path in other_paths))
+
+    def update(self, out_path, record):
+        self.entries[self.key(out_path)] = record
+        self.save()
+
+    def save(self):
+        # write to a temporary file first so an interrupted run never leaves a truncated manifest
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
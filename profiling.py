@@ -0,0 +1,139 @@
+import time
+import heapq
+
+
+class ConversionStats:
+    # metrics collected by ud_binarize when a stats object is passed in
+    #
+    # add_sentence and add_file act as hooks: subclasses can override them (calling super()) to observe
+    # every converted sentence and file; with worker processes the workers only record the calls in a
+    # StatsRecorder and the caller's object repeats them with replay, so its hooks see every call
+    STAGES = ('read', 'cache', 'dtree', 'projectivity', 'lifting', 'btree', 'record', 'sexp', 'write')
+
+    def __init__(self, n_slowest=10):
+        self.n_slowest = n_slowest
+        self.stage_seconds = {stage: 0.0 for stage in self.STAGES}
+        self.n_sentences = 0
+        self.n_tokens = 0
+        self.n_non_projective = 0
+        self.n_cached = 0   # sentences served from a SentenceCache; not checked for projectivity
+        self.n_lifts = 0
+        self.max_lift_depth = 0
+        self.slowest = []   # min-heap of (seconds, sent_id, n_tokens)
+        self.files = []
+
+    def add_stage_time(self, stage, seconds):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def add_sentence(self, sent_id, n_tokens, seconds, non_projective=False, lift_stats=None, cached=False):
+        self.n_sentences += 1
+        self.n_tokens += n_tokens
+        if cached:
+            self.n_cached += 1
+        if non_projective:
+            self.n_non_projective += 1
+        if lift_stats is not None:
+            self.n_lifts += lift_stats.n_lifts
+            self.max_lift_depth = max(self.max_lift_depth, lift_stats.max_lift_depth)
+
+        self._add_slow(seconds, sent_id, n_tokens)
+
+    def _add_slow(self, seconds, sent_id, n_tokens):
+        if self.n_slowest <= 0:
+            return
+        if len(self.slowest) < self.n_slowest:
+            heapq.heappush(self.slowest, (seconds, sent_id, n_tokens))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, sent_id, n_tokens))
+
+    def add_file(self, path, n_sentences, n_tokens, seconds):
+        self.files.append({'path': path,
+                           'sentences': n_sentences,
+                           'tokens': n_tokens,
+                           'seconds': seconds,
+                           'sentences_per_sec': n_sentences / seconds if seconds > 0 else None,
+                           'tokens_per_sec': n_tokens / seconds if seconds > 0 else None})
+
+    def merge(self, other):
+        for stage, seconds in other.stage_seconds.items():
+            self.add_stage_time(stage, seconds)
+        self.n_sentences += other.n_sentences
+        self.n_tokens += other.n_tokens
+        self.n_non_projective += other.n_non_projective
+        self.n_cached += other.n_cached
+        self.n_lifts += other.n_lifts
+        self.max_lift_depth = max(self.max_lift_depth, other.max_lift_depth)
+        for seconds, sent_id, n_tokens in other.slowest:
+            self._add_slow(seconds, sent_id, n_tokens)
+        self.files.extend(other.files)
+
+    def replay(self, recorder):
+        # add the stage times of a StatsRecorder and repeat its add_sentence/add_file calls in order
+        for stage, seconds in recorder.stage_seconds.items():
+            self.add_stage_time(stage, seconds)
+        for method, args in recorder.calls:
+            getattr(self, method)(*args)
+
+    def to_dict(self):
+        return {'stage_seconds': dict(self.stage_seconds),
+                'sentences': self.n_sentences,
+                'tokens': self.n_tokens,
+                'non_projective_sentences': self.n_non_projective,
+                'cached_sentences': self.n_cached,
+                'lifted_arcs': self.n_lifts,
+                'max_lift_depth': self.max_lift_depth,
+                'slowest_sentences': [{'sent_id': sent_id, 'tokens': n_tokens, 'seconds': seconds}
+                                      for seconds, sent_id, n_tokens in sorted(self.slowest, reverse=True)],
+                'files': list(self.files)}
+
+    def report(self):
+        lines = ['{} sentence(s), {} token(s), {} non-projective sentence(s), {} lifted arc(s), {} from cache'.format(
+            self.n_sentences, self.n_tokens, self.n_non_projective, self.n_lifts, self.n_cached)]
+
+        total = sum(self.stage_seconds.values())
+        lines.append('time per stage:')
+        for stage, seconds in self.stage_seconds.items():
+            share = seconds / total * 100 if total > 0 else 0.0
+            lines.append('  {:<14} {:>10.3f} s {:>6.1f}%'.format(stage, seconds, share))
+
+        lines.append('files:')
+        for file_stats in self.files:
+            lines.append('  {} ({:.0f} sentences/s, {:.0f} tokens/s)'.format(
+                file_stats['path'], file_stats['sentences_per_sec'] or 0, file_stats['tokens_per_sec'] or 0))
+
+        lines.append('slowest sentences:')
+        for seconds, sent_id, n_tokens in sorted(self.slowest, reverse=True):
+            lines.append('  {:>10.4f} s {:>6} tokens  {}'.format(seconds, n_tokens, sent_id))
+
+        return '\n'.join(lines)
+
+
+class StatsRecorder(ConversionStats):
+    # stats of a worker process: stage times are summed, add_sentence and add_file calls are only
+    # recorded (with picklable arguments) for ConversionStats.replay in the caller's process
+    def __init__(self):
+        super().__init__(n_slowest=0)
+        self.calls = []
+
+    def add_sentence(self, sent_id, n_tokens, seconds, non_projective=False, lift_stats=None, cached=False):
+        self.calls.append(('add_sentence', (sent_id, n_tokens, seconds, non_projective, lift_stats, cached)))
+
+    def add_file(self, path, n_sentences, n_tokens, seconds):
+        self.calls.append(('add_file', (path, n_sentences, n_tokens, seconds)))
+
+
+class StageTimer:
+    # adds the time since the previous lap to a stage of a ConversionStats
+    __slots__ = ('stats', 'start', 'last')
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stats.add_stage_time(stage, now - self.last)
+        self.last = now
+
+    def elapsed(self):
+        return self.last - self.start
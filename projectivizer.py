@@ -0,0 +1,80 @@
+from crossing import CrossingIndex
+
+
+class LiftStats:
+    def __init__(self):
+        self.n_crossing = 0       # arcs crossing a previously traversed arc
+        self.n_lifts = 0          # arcs moved to an ancestor of their head
+        self.max_lift_depth = 0   # largest number of levels an arc was moved up
+
+
+def lift_non_projective(dtree):
+    # pseudo-projective lifting: move arcs that cross other arcs up to the nearest
+    # ancestor of their head where they no longer cross; lifted deprels are marked with '*'
+    stats = LiftStats()
+
+    dtree_root = dtree.get_children(0)[0]
+    bottom_up = list()
+    in_bottom_up = set()
+    range_index = CrossingIndex(len(dtree.head))
+
+    # top-down traverse
+    # save arcs that cross previously traversed arcs;
+    # depth-first with an explicit stack, checking all children of a node before descending
+    stack = [dtree_root]
+    while stack:
+        parent = stack.pop()
+
+        # get immediate children
+        children = dtree.get_children(parent)
+
+        for child in children:
+            start, end = min(child, parent), max(child, parent)
+
+            if range_index.crosses(start, end):
+                if child not in in_bottom_up:
+                    bottom_up.append(child)
+                    in_bottom_up.add(child)
+
+            range_index.add(start, end)
+
+        stack.extend(reversed(children))
+
+    stats.n_crossing = len(bottom_up)
+
+    # traverse crossing arcs from bottom-up
+    for n in reversed(bottom_up):
+        # get parent of current node
+        parent = dtree.get_parent(n)
+
+        # the arc of n is not put back into the index after lifting
+        range_index.remove(min(n, parent), max(n, parent))
+
+        final_lift_dest = parent
+        lift_depth = 0
+
+        # keep lifting until projective; never lift to the dummy root
+        current_parent = parent
+        depth = 0
+        while True:
+            grandparent = dtree.get_parent(current_parent)
+            if not grandparent:
+                break
+
+            depth += 1
+            if not range_index.crosses(min(n, grandparent), max(n, grandparent)):
+                final_lift_dest = grandparent
+                lift_depth = depth
+                break
+
+            current_parent = grandparent
+
+        if final_lift_dest != parent:
+            # mark this deprel as a result of lifting
+            new_deprel = dtree.get_deprel(n) + '*'
+            dtree.set_head(n, final_lift_dest, new_deprel)
+
+            stats.n_lifts += 1
+            stats.max_lift_depth = max(stats.max_lift_depth, lift_depth)
+
+    return stats
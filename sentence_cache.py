@@ -0,0 +1,96 @@
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+
+class SentenceCache:
+    # content-addressed cache of binarized s-expressions, keyed on the token rows that determine the
+    # conversion (idx, form, upos, head, deprel) plus a settings string; sent_id and text are not part of it
+    #
+    # recently used entries are kept in an in-memory LRU of max_size entries;
+    # with db_path, entries are also stored in a SQLite file shared across runs and processes
+    def __init__(self, settings, max_size=100000, db_path=None):
+        self.settings = settings
+        self.max_size = max_size
+        self.db_path = db_path
+        self.lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # rows not yet written to the database; they are written and committed together by flush,
+        # so the database's single write lock is only held while a batch is written
+        self.db = None
+        self.pending = dict()
+        if db_path is not None:
+            self.db = sqlite3.connect(db_path, timeout=60)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS sexps (key TEXT PRIMARY KEY, sexp TEXT NOT NULL)')
+            self.db.commit()
+
+    def config(self):
+        # arguments to rebuild an equivalent cache in a worker process
+        return {'settings': self.settings, 'max_size': self.max_size, 'db_path': self.db_path}
+
+    def key(self, sentence):
+        rows = ['\t'.join([str(token.idx), token.form, token.upos, str(token.head), token.deprel])
+                for token in sentence]
+        rows.append(self.settings)
+        return hashlib.blake2b('\n'.join(rows).encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, key):
+        sexp = self.lru.get(key)
+        if sexp is not None:
+            self.lru.move_to_end(key)
+            self.hits += 1
+            return sexp
+
+        sexp = self.pending.get(key)
+        if sexp is not None:
+            self.hits += 1
+            return sexp
+
+        if self.db is not None:
+            row = self.db.execute('SELECT sexp FROM sexps WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                self.hits += 1
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, sexp):
+        self._remember(key, sexp)
+
+        if self.db is not None:
+            self.pending[key] = sexp
+            if len(self.pending) >= 1000:
+                self.flush()
+
+    def _remember(self, key, sexp):
+        if self.max_size <= 0:
+            return
+
+        self.lru[key] = sexp
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.max_size:
+            self.lru.popitem(last=False)
+
+    def take_counts(self):
+        # hits and misses since the last call, e.g. to report them from a worker process
+        counts = (self.hits, self.misses)
+        self.hits = 0
+        self.misses = 0
+        return counts
+
+    def flush(self):
+        if self.db is not None and self.pending:
+            self.db.executemany('INSERT OR REPLACE INTO sexps (key, sexp) VALUES (?, ?)', self.pending.items())
+            self.db.commit()
+            self.pending = dict()
+
+    def close(self):
+        self.flush()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
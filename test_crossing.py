@@ -0,0 +1,114 @@
+import random
+from crossing import arc_spans, is_projective, CrossingIndex
+from data_loader import UDToken
+
+
+def spans_cross(span1, span2):
+    # pairwise test of the previous check_cross_dependencies: neither span contains the other and they overlap
+    (start1, end1), (start2, end2) = span1, span2
+    if (start1 <= start2 and end1 >= end2) or (start2 <= start1 and end2 >= end1):
+        return False
+    return max(start1, start2) - min(end1, end2) < 0
+
+
+def has_crossing(spans):
+    return any(spans_cross(spans[i], spans[j]) for i in range(len(spans)) for j in range(i))
+
+
+def random_spans(rng, n_positions, n_spans):
+    spans = []
+    for _ in range(n_spans):
+        start, end = sorted(rng.sample(range(n_positions), 2))
+        spans.append((start, end))
+    return spans
+
+
+def random_sentence(rng, n_tokens):
+    # tokens with random heads, not necessarily a tree; only the arcs matter here
+    return [UDToken(idx, 'w', 'X', '_', rng.choice([head for head in range(n_tokens + 1) if head != idx]), 'dep')
+            for idx in range(1, n_tokens + 1)]
+
+
+def test_arc_spans():
+    sentence = [UDToken(1, 'a', 'X', '_', 3, 'dep'), UDToken(2, 'b', 'X', '_', 0, 'root'),
+                UDToken(3, 'c', 'X', '_', 2, 'dep')]
+    assert arc_spans(sentence) == [(1, 3), (0, 2), (2, 3)]
+
+
+def test_is_projective_examples():
+    assert is_projective([])
+    assert is_projective([(0, 3), (1, 2), (2, 3)])
+    # shared endpoints and identical spans do not cross
+    assert is_projective([(1, 3), (3, 5), (1, 5), (1, 5)])
+    assert not is_projective([(1, 3), (2, 4)])
+    assert not is_projective([(0, 5), (2, 4), (3, 6)])
+
+
+def test_is_projective_random():
+    rng = random.Random(8)
+    for _ in range(2000):
+        n_positions = rng.randint(2, 12)
+        spans = random_spans(rng, n_positions, rng.randint(0, 10))
+        assert is_projective(spans) == (not has_crossing(spans)), spans
+
+
+def test_is_projective_random_sentences():
+    rng = random.Random(9)
+    for _ in range(500):
+        sentence = random_sentence(rng, rng.randint(1, 15))
+        spans = arc_spans(sentence)
+        assert is_projective(spans) == (not has_crossing(spans))
+
+
+def test_crossing_index_random():
+    rng = random.Random(10)
+    for _ in range(500):
+        n_positions = rng.randint(2, 20)
+        spans = random_spans(rng, n_positions, rng.randint(0, 15))
+        index = CrossingIndex(n_positions, spans)
+
+        # remove some arcs, including duplicates of arcs that stay in the index
+        remaining = list(spans)
+        for span in rng.sample(spans, rng.randint(0, len(spans))):
+            index.remove(*span)
+            remaining.remove(span)
+
+        for query in random_spans(rng, n_positions, 10) + spans:
+            expected = sorted(span for span in remaining if spans_cross(span, query))
+            assert index.crossing(*query) == expected, (remaining, query)
+            assert index.crosses(*query) == bool(expected), (remaining, query)
+
+        # arcs can be added back after removal
+        for span in spans:
+            if span not in remaining:
+                index.add(*span)
+                remaining.append(span)
+        for query in spans:
+            assert index.crossing(*query) == sorted(span for span in remaining if spans_cross(span, query))
+
+
+def test_crossing_index_remove_missing_arc():
+    index = CrossingIndex(4, [(0, 2)])
+    try:
+        index.remove(1, 3)
+    except ValueError:
+        pass
+    else:
+        assert False, 'removing an arc that is not in the index should raise ValueError'
+
+
+def test_crossing_index_fan_out():
+    # many arcs at one position, as for a head with many dependents
+    n_positions = 64
+    index = CrossingIndex(n_positions)
+    spans = [(0, end) for end in range(2, n_positions)] + [(start, n_positions - 1) for start in range(1, 40)]
+    for span in spans:
+        index.add(*span)
+    for span in spans[::3]:
+        index.remove(*span)
+    remaining = [span for k, span in enumerate(spans) if k % 3]
+
+    for query in spans + [(1, 5), (3, 50), (10, 63)]:
+        expected = sorted(span for span in remaining if spans_cross(span, query))
+        assert index.crossing(*query) == expected
+        assert index.crosses(*query) == bool(expected)
@@ -0,0 +1,52 @@
+import os
+from benchmark import chain_sentence, deep_trees, recursive_sexp, run_recursive
+from btree import get_obliqueness_hierarchy
+from data_loader import iter_conllu
+from main import binarize_sentence, check_cross_dependencies, pprint_sexp, to_sexp, write_sexp
+
+
+N_TOKENS = 5000
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'samples.conllu')
+
+
+def check_against_reference(ud_sentence, use_pseudo_projective=True):
+    dtree, btree, head_map = deep_trees(ud_sentence, use_pseudo_projective)
+    expected = run_recursive(recursive_sexp, dtree, head_map, get_obliqueness_hierarchy())
+
+    buffer = []
+    write_sexp(dtree, btree, head_map, buffer.append, pretty=False)
+    assert ''.join(buffer) == expected
+
+    output = binarize_sentence(ud_sentence, use_pseudo_projective)
+    assert output == '# sent_id = {}\n# text = {}\n{}\n\n'.format(ud_sentence.sent_id, ud_sentence.text,
+                                                                   pprint_sexp(expected))
+
+
+def test_samples():
+    for ud_sentence in iter_conllu(SAMPLES_PATH):
+        check_against_reference(ud_sentence, use_pseudo_projective=False)
+        check_against_reference(ud_sentence, use_pseudo_projective=True)
+
+
+def test_short_chain():
+    dtree, btree, head_map = deep_trees(chain_sentence(3))
+    assert to_sexp(dtree, btree, head_map) == '(nmod:poss (obj (NOUN w1)(NOUN-H w2))(NOUN-H w3))'
+
+
+def test_head_final_chain():
+    check_against_reference(chain_sentence(N_TOKENS, head_final=True))
+
+
+def test_head_initial_chain():
+    check_against_reference(chain_sentence(N_TOKENS, head_final=False))
+
+
+def test_non_projective_chains():
+    # every 7th token and the one before it skip a level, so lifting runs on the deep tree as well
+    for head_final in (True, False):
+        ud_sentence = chain_sentence(N_TOKENS, head_final, skip_every=7)
+        assert check_cross_dependencies(ud_sentence.sentence)
+        dtree, _, _ = deep_trees(ud_sentence)
+        assert any(deprel is not None and deprel.endswith('*') for deprel in dtree.deprel)
+        check_against_reference(ud_sentence)
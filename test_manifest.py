@@ -0,0 +1,47 @@
+import os
+import shutil
+from data_loader import iter_conllu
+from main import MANIFEST_NAME, bintree_path, find_treebank_files, ud_binarize_files
+from manifest import Manifest
+
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'samples.conllu')
+
+
+def test_missing_bintree_is_rebuilt(tmp_path):
+    binarized_path = str(tmp_path / 'samples.binarized')
+    file_pairs = [(SAMPLES_PATH, binarized_path)]
+    manifest = Manifest(str(tmp_path / MANIFEST_NAME))
+
+    ud_binarize_files(file_pairs, manifest=manifest, output_format='both')
+    os.remove(bintree_path(binarized_path))
+    modified = os.path.getmtime(binarized_path)
+
+    ud_binarize_files(file_pairs, manifest=manifest, output_format='both')
+    assert os.path.exists(bintree_path(binarized_path))
+
+    # nothing is rebuilt once both files exist
+    os.utime(binarized_path, (modified - 10, modified - 10))
+    ud_binarize_files(file_pairs, manifest=manifest, output_format='both')
+    assert os.path.getmtime(binarized_path) == modified - 10
+
+
+def test_selection_keeps_full_output(tmp_path):
+    ud_path = tmp_path / 'ud' / 'treebank'
+    ud_path.mkdir(parents=True)
+    shutil.copy(SAMPLES_PATH, str(ud_path))
+    export_path = str(tmp_path / 'export')
+
+    full_pairs = find_treebank_files(str(tmp_path / 'ud'), export_path)
+    ud_binarize_files(full_pairs)
+
+    sent_id = next(iter_conllu(SAMPLES_PATH)).sent_id
+    selected_pairs = find_treebank_files(str(tmp_path / 'ud'), export_path, sent_ids={sent_id})
+    assert selected_pairs[0][1] != full_pairs[0][1]
+    assert '.sel-' in selected_pairs[0][1]
+    ud_binarize_files(selected_pairs, sent_ids={sent_id})
+
+    with open(full_pairs[0][1]) as f:
+        assert f.read().count('# sent_id') == 2
+    with open(selected_pairs[0][1]) as f:
+        assert f.read().count('# sent_id') == 1
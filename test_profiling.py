@@ -0,0 +1,51 @@
+import os
+from main import ud_binarize, ud_binarize_files
+from profiling import ConversionStats
+
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'samples.conllu')
+
+
+class RecordingStats(ConversionStats):
+    # subclass overriding the hooks, as a library user would
+    def __init__(self, n_slowest=10):
+        super().__init__(n_slowest)
+        self.sent_ids = []
+        self.paths = []
+
+    def add_sentence(self, sent_id, *args, **kwargs):
+        self.sent_ids.append(sent_id)
+        super().add_sentence(sent_id, *args, **kwargs)
+
+    def add_file(self, path, *args):
+        self.paths.append(path)
+        super().add_file(path, *args)
+
+
+def counts(stats):
+    return (stats.n_sentences, stats.n_tokens, stats.n_non_projective, stats.n_lifts, len(stats.slowest),
+            len(stats.files))
+
+
+def test_hooks_with_sentence_jobs(tmp_path):
+    results = []
+    for jobs in (1, 2):
+        stats = RecordingStats()
+        ud_binarize(SAMPLES_PATH, str(tmp_path / 'samples.binarized'), use_pseudo_projective=True, jobs=jobs,
+                    chunk_size=1, stats=stats)
+        results.append((stats.sent_ids, stats.paths, counts(stats)))
+
+    assert results[0][0]
+    assert results[0] == results[1]
+
+
+def test_hooks_with_file_jobs(tmp_path):
+    file_pairs = [(SAMPLES_PATH, str(tmp_path / 'a.binarized')), (SAMPLES_PATH, str(tmp_path / 'b.binarized'))]
+    results = []
+    for jobs in (1, 2):
+        stats = RecordingStats()
+        ud_binarize_files(file_pairs, use_pseudo_projective=True, jobs=jobs, stats=stats)
+        results.append((sorted(stats.sent_ids), stats.paths, counts(stats)))
+
+    assert results[0][0]
+    assert results[0] == results[1]
@@ -0,0 +1,29 @@
+from sentence_cache import SentenceCache
+
+
+def test_concurrent_writers(tmp_path):
+    # two caches on one database file, as in two worker processes; neither holds the write lock
+    # between flushes, so a put does not wait for the other's uncommitted rows
+    db_path = str(tmp_path / 'cache.db')
+    first = SentenceCache('settings', db_path=db_path)
+    second = SentenceCache('settings', db_path=db_path)
+
+    first.put('a', '(A)')
+    second.put('b', '(B)')
+    second.flush()
+    first.flush()
+
+    reader = SentenceCache('settings', max_size=0, db_path=db_path)
+    assert reader.get('a') == '(A)'
+    assert reader.get('b') == '(B)'
+    assert reader.get('c') is None
+    for cache in (first, second, reader):
+        cache.close()
+
+
+def test_unflushed_rows_are_found(tmp_path):
+    cache = SentenceCache('settings', max_size=0, db_path=str(tmp_path / 'cache.db'))
+    cache.put('a', '(A)')
+    assert cache.get('a') == '(A)'
+    assert cache.take_counts() == (1, 0)
+    cache.close()
@@ -0,0 +1,81 @@
+import os
+import main
+from bintree import BinTreeReader
+from data_loader import UDSentence, UDToken, iter_conllu
+from main import bintree_path, checked_binarize_sentence, ud_binarize
+from validation import quarantine_path
+
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'samples.conllu')
+
+
+def write_conllu(path, sentences):
+    # sentences: (sent_id, [(idx, head, deprel), ...])
+    with open(path, 'w') as f:
+        for sent_id, rows in sentences:
+            f.write('# sent_id = {}\n# text = x\n'.format(sent_id))
+            for idx, head, deprel in rows:
+                f.write('{}\tw{}\t_\tX\t_\t_\t{}\t{}\t_\t_\n'.format(idx, idx, head, deprel))
+            f.write('\n')
+
+
+GOOD = [(1, 2, 'nsubj'), (2, 0, 'root')]
+CYCLE = [(1, 2, 'nsubj'), (2, 1, 'obj'), (3, 0, 'root')]
+
+
+def test_fail_names_sentence_on_conversion_error(monkeypatch):
+    def _broken(*args, **kwargs):
+        raise KeyError('boom')
+
+    monkeypatch.setattr(main, 'binarize_sentence', _broken)
+    ud_sentence = UDSentence([UDToken(1, 'a', 'X', '_', 0, 'root')], 's1', 'a')
+
+    try:
+        checked_binarize_sentence(ud_sentence, on_error='fail')
+    except ValueError as e:
+        assert str(e).startswith('cannot binarize sentence s1: conversion failed: KeyError')
+        assert isinstance(e.__cause__, KeyError)
+    else:
+        assert False, 'on_error fail should raise ValueError'
+
+    assert checked_binarize_sentence(ud_sentence, on_error='skip')[0] == ''
+
+
+def test_skip_and_quarantine(tmp_path):
+    in_path = str(tmp_path / 'in.conllu')
+    write_conllu(in_path, [('good1', GOOD), ('cycle', CYCLE), ('good2', GOOD)])
+
+    for policy in ('skip', 'quarantine'):
+        out_path = str(tmp_path / '{}.binarized'.format(policy))
+        assert ud_binarize(in_path, out_path, on_error=policy) == 1
+        with open(out_path) as f:
+            output = f.read()
+        assert 'good1' in output and 'good2' in output and 'cycle' not in output
+        assert os.path.exists(quarantine_path(out_path)) == (policy == 'quarantine')
+
+    with open(quarantine_path(str(tmp_path / 'quarantine.binarized'))) as f:
+        quarantined = list(iter_conllu(f.name))
+    assert [ud_sentence.sent_id for ud_sentence in quarantined] == ['cycle']
+
+
+def test_fail_closes_output_files(tmp_path):
+    in_path = str(tmp_path / 'in.conllu')
+    write_conllu(in_path, [('good1', GOOD), ('good2', GOOD), ('cycle', CYCLE), ('good3', GOOD)])
+    out_path = str(tmp_path / 'in.binarized')
+
+    try:
+        ud_binarize(in_path, out_path, output_format='both', on_error='fail')
+    except ValueError as e:
+        assert 'cannot binarize sentence cycle' in str(e)
+    else:
+        assert False, 'on_error fail should raise ValueError'
+
+    # the .bintree written before the error is complete and readable
+    with BinTreeReader(bintree_path(out_path)) as reader:
+        assert [reader.sent_ids[k] for k in range(len(reader))] == ['good1', 'good2']
+
+
+def test_unchecked_by_default(tmp_path):
+    out_path = str(tmp_path / 'samples.binarized')
+    assert ud_binarize(SAMPLES_PATH, out_path) == 0
+    assert not os.path.exists(quarantine_path(out_path))
@@ -0,0 +1,89 @@
+import os
+from file_io import strip_compression_suffix
+
+
+# what ud_binarize does with a sentence that fails validation or conversion:
+# fail aborts the run, skip leaves the sentence out, quarantine leaves it out and writes it to a side file;
+# without a policy (None) sentences are not validated
+ON_ERROR_POLICIES = ('fail', 'skip', 'quarantine')
+
+
+def validate_sentence(sentence, obliqueness_hierarchy):
+    # reason why sentence (a list of UDTokens) cannot be binarized, or None if it can;
+    # checks only what the conversion relies on, in a few linear passes over the tokens
+    heads = dict()
+    root_children = []
+    for token in sentence:
+        if token.idx <= 0 or token.idx in heads:
+            return 'invalid or duplicate token index {}'.format(token.idx)
+        heads[token.idx] = token.head
+        if token.head == 0:
+            root_children.append(token.idx)
+
+    if not root_children:
+        return 'missing root: no token has head 0'
+    if len(root_children) > 1:
+        return 'multiple root children: tokens {} have head 0'.format(', '.join(map(str, root_children)))
+
+    for token in sentence:
+        if token.head != 0 and token.head not in heads:
+            return 'head {} of token {} does not exist'.format(token.head, token.idx)
+
+    # the root token's deprel is never looked up
+    for token in sentence:
+        if token.head != 0:
+            try:
+                obliqueness_hierarchy[token.deprel]
+            except KeyError:
+                return 'deprel {} of token {} is not in the obliqueness hierarchy'.format(token.deprel, token.idx)
+
+    # every token must reach the root; tokens already known to reach it end the walk early
+    reaches_root = {0}
+    for token in sentence:
+        path = []
+        on_path = set()
+        idx = token.idx
+        while idx not in reaches_root:
+            if idx in on_path:
+                return 'cycle through token {}'.format(idx)
+            path.append(idx)
+            on_path.add(idx)
+            idx = heads[idx]
+        reaches_root.update(path)
+
+    return None
+
+
+def quarantine_path(out_path):
+    # side file next to the output, e.g. x.binarized.gz -> x.quarantine.conllu
+    return os.path.splitext(strip_compression_suffix(out_path))[0] + '.quarantine.conllu'
+
+
+class Quarantine:
+    # CoNLL-U file of rejected sentences, each preceded by its source file and the reason;
+    # only the columns the reader keeps are written (LEMMA, XPOS, DEPS and MISC become '_').
+    # The file is created on the first rejected sentence and an old one is removed up front
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self.f = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def add(self, ud_sentence, reason):
+        if self.f is None:
+            self.f = open(self.path, 'w')
+
+        lines = ['# source = {}'.format(self.source),
+                 '# error = {}'.format(reason),
+                 '# sent_id = {}'.format(ud_sentence.sent_id),
+                 '# text = {}'.format(ud_sentence.text)]
+        for token in ud_sentence.sentence:
+            lines.append('\t'.join([str(token.idx), token.form, '_', token.upos, '_', token.feats,
+                                    str(token.head), token.deprel, '_', '_']))
+        self.f.write('\n'.join(lines) + '\n\n')
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None